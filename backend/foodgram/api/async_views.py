@@ -0,0 +1,57 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.urls import URLPattern
+
+
+def async_view(view):
+    """Асинхронная обертка представления набора DRF ``view``.
+
+    GET и HEAD обрабатываются асинхронным методом набора с префиксом
+    ``a`` (``alist`` для ``list`` и т. д.) в цикле событий ASGI-сервера:
+    аутентификация, права и согласование формата выполняются как
+    в ``APIView.dispatch``, а чтение данных - асинхронным ORM. Остальные
+    методы передаются синхронному ``view`` в потоке. Если асинхронного
+    метода нет, возвращается ``view`` без изменений.
+    """
+    actions = getattr(view, 'actions', None) or {}
+    action = actions.get('get')
+    if action is None or not hasattr(view.cls, f'a{action}'):
+        return view
+    sync_view = sync_to_async(view)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await sync_view(request, *args, **kwargs)
+        self = view.cls(**view.initkwargs)
+        self.action_map = {'head': action, **actions}
+        for method, name in self.action_map.items():
+            setattr(self, method, getattr(self, name))
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, f'a{action}')
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(request, response, *args, **kwargs)
+
+    return wrapper
+
+
+def async_urls(patterns):
+    """Маршруты ``patterns`` с асинхронными представлениями для чтения."""
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_view(pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        )
+        for pattern in patterns
+    ]
@@ -0,0 +1,52 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+
+RECIPES = 'recipes'
+# Состав рецептов: какие ингредиенты есть в каких рецептах.
+RECIPE_INGREDIENTS = 'recipe_ingredients'
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+
+
+def user_version(user_id):
+    """Имя версии данных, зависящих от пользователя: избранного и корзины."""
+    return f'user:{user_id}'
+
+
+def get_version(name):
+    """Текущая версия данных ``name``.
+
+    Версия - время последнего изменения данных; она хранится в общем
+    кэше, поэтому одинакова для всех воркеров, которые к нему подключены.
+    """
+    key = f'version:{name}'
+    version = cache.get(key)
+    if version is not None:
+        return version
+    version = time.time()
+    if cache.add(key, version, None):
+        return version
+    return cache.get(key, version)
+
+
+def bump_version(name):
+    """Смена версии данных: все ключи прежней версии перестают читаться."""
+    cache.set(f'version:{name}', time.time(), None)
+
+
+def request_fingerprint(request):
+    """Хэш адреса запроса с отсортированными параметрами.
+
+    Порядок параметров и повторяющихся значений (например, ``tags``)
+    не влияет на результат.
+    """
+    query = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    )
+    url = f'{request.get_host()}{request.path}?{urlencode(query)}'
+    return hashlib.md5(url.encode()).hexdigest()
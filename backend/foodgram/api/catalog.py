@@ -0,0 +1,50 @@
+import threading
+
+from recipes.models import Ingredient, Tag
+
+from .cache import INGREDIENTS, TAGS, get_version
+
+
+class Catalog:
+    """Справочник, целиком загруженный в память процесса.
+
+    Теги и ингредиенты меняются редко, поэтому хранятся в памяти воркера
+    и читаются без запросов к базе. При каждом обращении сверяется версия
+    данных в общем кэше (см. ``api.cache``): после изменения справочника
+    в любом воркере остальные перечитают его при следующем обращении.
+    """
+
+    def __init__(self, model, version):
+        self.model = model
+        self.version = version
+        self._lock = threading.Lock()
+        self._data = None
+
+    def __deepcopy__(self, memo):
+        # Справочник общий для процесса: DRF копирует аргументы полей
+        # сериализатора, копия справочника при этом не нужна.
+        return self
+
+    def load(self):
+        """Версия, список объектов и словарь объектов по первичному ключу."""
+        version = get_version(self.version)
+        data = self._data
+        if data is not None and data[0] == version:
+            return data
+        with self._lock:
+            if self._data is None or self._data[0] != version:
+                objects = list(self.model.objects.all())
+                self._data = (
+                    version, objects, {obj.pk: obj for obj in objects}
+                )
+            return self._data
+
+    def all(self):
+        return self.load()[1]
+
+    def get(self, pk):
+        return self.load()[2].get(pk)
+
+
+tag_catalog = Catalog(Tag, TAGS)
+ingredient_catalog = Catalog(Ingredient, INGREDIENTS)
@@ -0,0 +1,65 @@
+import re
+
+from django.conf import settings
+from rest_framework import serializers
+
+
+class CatalogRelatedField(serializers.PrimaryKeyRelatedField):
+    """Ссылка на объект справочника по первичному ключу.
+
+    Объект берется из справочника в памяти процесса (``api.catalog``),
+    поэтому проверка не требует запроса к базе на каждое значение.
+    Версия справочника сверяется один раз за проверку данных корневым
+    сериализатором, а не для каждого значения.
+    """
+
+    def __init__(self, catalog, **kwargs):
+        self.catalog = catalog
+        super().__init__(**kwargs)
+
+    def get_objects(self):
+        """Объекты справочника по ключу, общие для всех полей проверки."""
+        loaded = self.root.__dict__.setdefault('loaded_catalogs', {})
+        if self.catalog not in loaded:
+            loaded[self.catalog] = self.catalog.load()[2]
+        return loaded[self.catalog]
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.get_objects().get(pk)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class DeferredBase64ImageField(serializers.CharField):
+    """Картинка в base64, которая декодируется позже, в фоновом потоке.
+
+    При проверке запроса смотрится только заголовок и размер строки,
+    декодирование и проверка самой картинки выполняются в
+    ``recipes.images.process_upload``.
+    """
+
+    header = re.compile(r'^data:image/[\w.+-]+;base64,')
+    default_error_messages = {
+        'invalid_image': 'Загрузите изображение в формате base64.',
+        'too_large': 'Размер изображения не должен превышать {max_size} байт.',
+    }
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('trim_whitespace', False)
+        kwargs.setdefault('write_only', True)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        data = super().to_internal_value(data)
+        if data.startswith('data:') and not self.header.match(data):
+            self.fail('invalid_image')
+        if len(data) > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        return data
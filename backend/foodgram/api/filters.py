@@ -1,7 +1,19 @@
 import django_filters
+from django.db.models import Case, FloatField, Value, When
 from rest_framework.filters import SearchFilter
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
+
+from .catalog import tag_catalog
+from .indexes import id_list, recipe_ingredient_index
+
+MATCH_ALL = 'all'
+MATCH_ANY = 'any'
+
+
+def tag_choices():
+    return [(tag.slug, tag.name) for tag in tag_catalog.all()]
 
 
 class IngredientFilter(SearchFilter):
@@ -12,11 +24,14 @@ class IngredientFilter(SearchFilter):
         fields = ('name', )
 
 
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    """Список чисел через запятую."""
+
+
 class RecipeFilter(django_filters.FilterSet):
-    tags = django_filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
+    tags = django_filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='filter_tags',
     )
     is_favorited = django_filters.NumberFilter(
         method='filter_is_favorited',
@@ -24,19 +39,85 @@ class RecipeFilter(django_filters.FilterSet):
     is_in_shopping_cart = django_filters.NumberFilter(
         method='filter_is_in_shopping_cart',
     )
+    search = django_filters.CharFilter(
+        method='filter_search',
+    )
+    ingredients = NumberInFilter(
+        method='filter_ingredients',
+    )
+    exclude_ingredients = NumberInFilter(
+        method='filter_exclude_ingredients',
+    )
+    match = django_filters.ChoiceFilter(
+        choices=((MATCH_ALL, 'Все ингредиенты'), (MATCH_ANY, 'Любой')),
+        method='filter_match',
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart', )
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart', 'search',
+            'ingredients', 'exclude_ingredients', 'match',
+        )
+
+    def filter_tags(self, queryset, name, value):
+        """Рецепты с любым из тегов; слаги сверяются со справочником."""
+        slugs = set(value)
+        return queryset.filter(tags__in=[
+            tag.pk for tag in tag_catalog.all() if tag.slug in slugs
+        ]).distinct()
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(favorite__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(favorite_shops__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск; самые релевантные рецепты первыми."""
+        return search_recipes(queryset, value)
+
+    def filter_ingredients(self, queryset, name, value):
+        """Рецепты с ингредиентами из списка по индексу в памяти.
+
+        С ``match=any`` достаточно одного ингредиента из списка. Первыми
+        идут рецепты, большая часть ингредиентов которых есть в списке.
+        """
+        data = self.form.cleaned_data
+        levels = recipe_ingredient_index.coverage(
+            value,
+            match_all=data.get('match') != MATCH_ANY,
+            exclude=data.get('exclude_ingredients') or (),
+        )
+        if not levels:
+            return queryset.none()
+        return queryset.filter(
+            pk__in=id_list(recipe_id for ids in levels.values()
+                           for recipe_id in ids)
+        ).annotate(coverage=Case(
+            *(
+                When(pk__in=id_list(ids), then=Value(share))
+                for share, ids in sorted(levels.items(), reverse=True)
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )).order_by('-coverage', '-pub_date', '-id')
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        """Рецепты без ингредиентов из списка."""
+        if self.form.cleaned_data.get('ingredients'):
+            return queryset
+        excluded = recipe_ingredient_index.recipes(value)
+        if not excluded:
+            return queryset
+        return queryset.exclude(pk__in=id_list(excluded))
+
+    def filter_match(self, queryset, name, value):
+        """Учитывается в ``filter_ingredients``."""
         return queryset
@@ -0,0 +1,159 @@
+import bisect
+import json
+import threading
+from collections import Counter, defaultdict
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from recipes.models import RecipeIngredient
+
+from .cache import RECIPE_INGREDIENTS, get_version
+from .catalog import ingredient_catalog
+
+
+class IngredientIndex:
+    """Поиск ингредиентов по названию в памяти процесса.
+
+    Названия хранятся в отсортированном списке в нижнем регистре, поэтому
+    совпадения по началу названия находятся двоичным поиском, а база
+    не участвует в поиске. Индекс строится по справочнику ингредиентов
+    и перестраивается, когда справочник перечитан после изменений.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._index = None
+
+    def build(self, source):
+        ingredients = sorted(
+            source, key=lambda ingredient: ingredient.name.casefold()
+        )
+        keys = [ingredient.name.casefold() for ingredient in ingredients]
+        return source, keys, ingredients
+
+    def load(self):
+        """Названия в нижнем регистре и ингредиенты в том же порядке."""
+        source = self.catalog.all()
+        index = self._index
+        if index is None or index[0] is not source:
+            index = self._index = self.build(source)
+        return index[1], index[2]
+
+    def search(self, query='', limit=None):
+        """Ингредиенты, название которых содержит ``query``.
+
+        Сначала идут ингредиенты, название которых начинается с ``query``,
+        затем остальные совпадения; внутри групп - по алфавиту.
+        """
+        keys, ingredients = self.load()
+        query = query.strip().casefold()
+        if not query:
+            return ingredients[:limit]
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_left(keys, query + chr(0x10FFFF), start)
+        result = ingredients[start:end]
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+        for position, key in enumerate(keys):
+            if start <= position < end or query not in key:
+                continue
+            result.append(ingredients[position])
+            if len(result) == limit:
+                break
+        return result
+
+
+class RecipeIngredientIndex:
+    """Обратный индекс: ингредиент - множество рецептов с ним.
+
+    Индекс хранится в памяти процесса, поэтому рецепты с нужными
+    ингредиентами находятся пересечением и объединением множеств, без
+    соединения таблиц рецептов и ингредиентов в базе. Как и справочники
+    (см. ``api.catalog``), индекс сверяет версию состава рецептов
+    ``RECIPE_INGREDIENTS`` в общем кэше и перестраивается только после
+    изменения ингредиентов рецептов, а не любых данных рецептов.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self._lock = threading.Lock()
+        self._index = None
+
+    def build(self):
+        recipes = defaultdict(set)
+        sizes = Counter()
+        rows = RecipeIngredient.objects.values_list(
+            'ingredient_id', 'recipe_id'
+        ).order_by()
+        for ingredient_id, recipe_id in rows.iterator(chunk_size=10000):
+            recipes[ingredient_id].add(recipe_id)
+            sizes[recipe_id] += 1
+        return {
+            ingredient_id: frozenset(ids)
+            for ingredient_id, ids in recipes.items()
+        }, sizes
+
+    def load(self):
+        """Рецепты каждого ингредиента и число ингредиентов рецептов."""
+        version = get_version(self.version)
+        index = self._index
+        if index is not None and index[0] == version:
+            return index[1]
+        with self._lock:
+            if self._index is None or self._index[0] != version:
+                self._index = (version, self.build())
+            return self._index[1]
+
+    def recipes(self, ingredients):
+        """Рецепты с любым из ингредиентов."""
+        recipes, _ = self.load()
+        return frozenset().union(
+            *(recipes.get(pk, ()) for pk in ingredients)
+        )
+
+    def coverage(self, ingredients, match_all=True, exclude=()):
+        """Рецепты по доле их ингредиентов, которые есть в ``ingredients``.
+
+        Возвращает {доля: [рецепты]} для рецептов со всеми ингредиентами
+        (``match_all``) или хотя бы с одним из них, кроме рецептов
+        с ингредиентами из ``exclude``. Доля 1 означает, что рецепт можно
+        приготовить только из ``ingredients``.
+        """
+        recipes, sizes = self.load()
+        found = sorted(
+            (recipes.get(pk, frozenset()) for pk in set(ingredients)),
+            key=len
+        )
+        if not found:
+            return {}
+        if match_all:
+            matched = Counter(dict.fromkeys(
+                found[0].intersection(*found[1:]), len(found)
+            ))
+        else:
+            matched = Counter()
+            for ids in found:
+                matched.update(ids)
+        excluded = self.recipes(exclude)
+        levels = defaultdict(list)
+        for recipe_id, count in matched.items():
+            if recipe_id not in excluded:
+                levels[count / sizes[recipe_id]].append(recipe_id)
+        return levels
+
+
+def id_list(ids):
+    """Подзапрос со списком первичных ключей в одном параметре.
+
+    Длинный список не превращается в тысячи параметров запроса:
+    в PostgreSQL он передается массивом, в SQLite - строкой JSON.
+    """
+    ids = list(ids)
+    if connection.vendor == 'postgresql':
+        return RawSQL('SELECT unnest(%s::bigint[])', (ids, ))
+    return RawSQL('SELECT value FROM json_each(%s)', (json.dumps(ids), ))
+
+
+ingredient_index = IngredientIndex(ingredient_catalog)
+recipe_ingredient_index = RecipeIngredientIndex(RECIPE_INGREDIENTS)
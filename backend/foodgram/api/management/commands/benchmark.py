@@ -0,0 +1,363 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import (DEFAULT_DB_ALIAS, close_old_connections, connection,
+                       connections)
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+def scenarios():
+    """Сценарии нагрузки: (название, путь, нужна ли авторизация).
+
+    Пути строятся по данным в базе, например после
+    ``generate_sample_data``.
+    """
+    recipe = Recipe.objects.order_by('-pub_date').first()
+    tags = Tag.objects.order_by('?')[:2]
+    ingredient = Ingredient.objects.order_by('?').first()
+    if recipe is None or not tags or ingredient is None:
+        raise CommandError(
+            'В базе нет данных, запустите generate_sample_data.'
+        )
+    tag_query = '&'.join(f'tags={tag.slug}' for tag in tags)
+    pantry = ','.join(
+        str(pk) for pk in recipe.recipe_ingredients.values_list(
+            'ingredient_id', flat=True
+        )
+    )
+    return (
+        ('recipes-list', '/api/recipes/', False),
+        ('recipes-list-authorized', '/api/recipes/', True),
+        ('recipes-detail', f'/api/recipes/{recipe.id}/', False),
+        ('recipes-filter-tags', f'/api/recipes/?{tag_query}', False),
+        ('recipes-search',
+         f'/api/recipes/?search={recipe.name.split()[0]}', False),
+        ('recipes-pantry',
+         f'/api/recipes/?ingredients={pantry}&match=any', False),
+        ('subscriptions', '/api/users/subscriptions/?recipes_limit=3', True),
+        ('download-shopping-cart', '/api/recipes/download_shopping_cart/',
+         True),
+        ('ingredients-search',
+         f'/api/ingredients/?name={ingredient.name[:3]}', False),
+    )
+
+
+def benchmark_user():
+    """Пользователь с наибольшим числом подписок и рецептов в корзине."""
+    user = User.objects.annotate(
+        follows=Count('follower', distinct=True),
+        carts=Count('favorite_shops', distinct=True),
+    ).order_by('-follows', '-carts').first()
+    if user is None:
+        raise CommandError('В базе нет пользователей.')
+    return user
+
+
+def connection_latency(new_thread=False, samples=20):
+    """Задержка соединения с базой на один запрос, миллисекунд.
+
+    ``new_connection`` - новое соединение и первый запрос к базе, как при
+    CONN_MAX_AGE=0 без пула; ``per_request`` - то же при текущих
+    настройках с учетом сохраненных соединений, их проверки и пула;
+    ``saved_per_request`` - разница между ними. С ``new_thread`` каждый
+    запрос выполняется в новом потоке, как под ASGI.
+    """
+    options = {
+        name: value for name, value in connection.settings_dict.get(
+            'OPTIONS', {}
+        ).items() if name != 'pool'
+    }
+    fresh = type(connections[DEFAULT_DB_ALIAS])(
+        {**connection.settings_dict, 'CONN_MAX_AGE': 0, 'OPTIONS': options}
+    )
+    fresh.inc_thread_sharing()
+
+    def new_connection():
+        with fresh.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        fresh.close()
+
+    def current():
+        request_started.send(sender=Command)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        request_finished.send(sender=Command)
+
+    def run(request):
+        if not new_thread:
+            return request()
+        thread = threading.Thread(target=request)
+        thread.start()
+        return thread.join()
+
+    latency = {}
+    for name, request in (('new_connection', new_connection),
+                          ('per_request', current)):
+        run(request)
+        durations = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            run(request)
+            durations.append(time.perf_counter() - start)
+        latency[name] = round(statistics.median(durations) * 1000, 2)
+    latency['saved_per_request'] = round(
+        latency['new_connection'] - latency['per_request'], 2
+    )
+    return latency
+
+
+def percentile(quantiles, value):
+    return round(quantiles[value - 1] * 1000, 2)
+
+
+class InProcessClient:
+    """Запросы к приложению в том же процессе, по клиенту на поток."""
+
+    def __init__(self, token):
+        self.token = token
+        self.local = threading.local()
+
+    def get(self, path, authorized):
+        name = 'authorized' if authorized else 'anonymous'
+        client = getattr(self.local, name, None)
+        if client is None:
+            client = APIClient()
+            if authorized:
+                client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+            setattr(self.local, name, client)
+        response = client.get(path)
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+        # Тестовый клиент не закрывает соединения с базой после запроса,
+        # в отличие от WSGI-сервера; без этого CONN_MAX_AGE не учитывается.
+        close_old_connections()
+        return response.status_code
+
+
+class AsgiClient:
+    """Запросы к ASGI-приложению в этом процессе, как от ASGI-сервера.
+
+    Все запросы выполняются в одном цикле событий; асинхронные
+    представления включаются настройкой ``ASYNC_VIEWS``.
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.application = ASGIHandler()
+
+    async def get(self, path, authorized):
+        path, _, query = path.partition('?')
+        headers = [(b'host', b'testserver')]
+        if authorized:
+            headers.append((b'authorization', f'Token {self.token}'.encode()))
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'query_string': query.encode(),
+            'headers': headers,
+            'server': ('testserver', 80),
+            'client': ('127.0.0.1', 0),
+        }
+        messages = [{'type': 'http.request', 'body': b''}]
+        statuses = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Клиент не отключается; ожидание отменит сам обработчик.
+            return await asyncio.Future()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        await self.application(scope, receive, send)
+        return statuses[0]
+
+
+class HttpClient:
+    """Запросы к запущенному серверу, например gunicorn."""
+
+    def __init__(self, token, url):
+        self.token = token
+        self.url = url.rstrip('/')
+
+    def get(self, path, authorized):
+        headers = {}
+        if authorized:
+            headers['Authorization'] = f'Token {self.token}'
+        try:
+            with urlopen(Request(self.url + path, headers=headers)) as file:
+                file.read()
+                return file.status
+        except HTTPError as error:
+            return error.code
+        except URLError as error:
+            raise CommandError(f'{self.url}: {error.reason}') from error
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест основных эндпоинтов API. Выводит задержки '
+        'p50/p95/p99 в миллисекундах и пропускную способность в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help='Адрес запущенного сервера, например http://127.0.0.1:8000. '
+                 'По умолчанию запросы выполняются в этом процессе.',
+        )
+        parser.add_argument(
+            '--asgi',
+            action='store_true',
+            help='Выполнять запросы в этом процессе через ASGI-обработчик '
+                 'в одном цикле событий вместо потоков WSGI. Асинхронные '
+                 'представления включаются переменной ASYNC_VIEWS=1.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Количество запросов в каждом сценарии.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Количество одновременных запросов.',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=10,
+            help='Количество запросов для прогрева перед замером.',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            dest='scenarios',
+            help='Запустить только указанный сценарий; '
+                 'можно указать несколько раз.',
+        )
+        parser.add_argument(
+            '--label',
+            default='',
+            help='Метка результата, например хэш коммита.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для результата в JSON.',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError('Нужно не меньше двух запросов.')
+        token, _ = Token.objects.get_or_create(user=benchmark_user())
+        selected = [
+            scenario for scenario in scenarios()
+            if not options['scenarios'] or scenario[0] in options['scenarios']
+        ]
+        if options['url']:
+            client, target = HttpClient(token.key, options['url']), None
+        elif options['asgi']:
+            client, target = AsgiClient(token.key), 'in-process-asgi'
+        else:
+            client, target = InProcessClient(token.key), 'in-process'
+        run = self.run_async if options['asgi'] else self.run
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(ALLOWED_HOSTS=hosts):
+            results = {
+                name: run(client, path, authorized, options)
+                for name, path, authorized in selected
+            }
+        database = connection.settings_dict
+        report = json.dumps({
+            'label': options['label'],
+            'target': options['url'] or target,
+            'async_views': settings.ASYNC_VIEWS,
+            'database': {
+                'vendor': connection.vendor,
+                'conn_max_age': database['CONN_MAX_AGE'],
+                'health_checks': database['CONN_HEALTH_CHECKS'],
+                'pool': bool(database.get('OPTIONS', {}).get('pool')),
+                'latency': connection_latency(new_thread=options['asgi']),
+            },
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'scenarios': results,
+        }, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report)
+        self.stdout.write(report)
+
+    def run(self, client, path, authorized, options):
+        """Сценарий в потоках: ``concurrency`` запросов одновременно."""
+        for _ in range(options['warmup']):
+            client.get(path, authorized)
+
+        def timed(_):
+            start = time.perf_counter()
+            status = client.get(path, authorized)
+            return time.perf_counter() - start, status
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(timed, range(options['requests'])))
+        return self.summary(path, results, time.perf_counter() - start)
+
+    def run_async(self, client, path, authorized, options):
+        """Сценарий в цикле событий: не больше ``concurrency`` запросов
+        одновременно."""
+        async def timed(semaphore):
+            async with semaphore:
+                start = time.perf_counter()
+                status = await client.get(path, authorized)
+                return time.perf_counter() - start, status
+
+        async def scenario():
+            for _ in range(options['warmup']):
+                await client.get(path, authorized)
+            semaphore = asyncio.Semaphore(options['concurrency'])
+            start = time.perf_counter()
+            results = await asyncio.gather(*(
+                timed(semaphore) for _ in range(options['requests'])
+            ))
+            return self.summary(path, results, time.perf_counter() - start)
+
+        return asyncio.run(scenario())
+
+    def summary(self, path, results, elapsed):
+        """Задержки и пропускная способность по парам (время, статус)."""
+        durations = [duration for duration, _ in results]
+        quantiles = statistics.quantiles(durations, n=100, method='inclusive')
+        return {
+            'path': path,
+            'errors': sum(status >= 400 for _, status in results),
+            'p50': percentile(quantiles, 50),
+            'p95': percentile(quantiles, 95),
+            'p99': percentile(quantiles, 99),
+            'mean': round(statistics.fmean(durations) * 1000, 2),
+            'throughput': round(len(results) / elapsed, 1),
+        }
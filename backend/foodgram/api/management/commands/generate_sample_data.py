@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.sampledata import SAMPLE_PASSWORD, create_sample_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает синтетических пользователей, рецепты, подписки, '
+        'избранное и корзины для нагрузочного тестирования.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default, help_text in (
+            ('users', 1000, 'Количество пользователей.'),
+            ('recipes', 10000, 'Количество рецептов.'),
+            ('ingredients', 2000, 'Количество ингредиентов.'),
+            ('tags', 10, 'Количество тегов.'),
+            ('recipe-ingredients', 8,
+             'Среднее количество ингредиентов в рецепте.'),
+            ('recipe-tags', 2, 'Наибольшее количество тегов рецепта.'),
+            ('favorites', 20,
+             'Среднее количество рецептов в избранном пользователя.'),
+            ('carts', 5, 'Среднее количество рецептов в корзине.'),
+            ('follows', 10, 'Среднее количество подписок пользователя.'),
+        ):
+            parser.add_argument(
+                f'--{name}', type=int, default=default, help=help_text
+            )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Начальное значение генератора случайных чисел.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            data = create_sample_data(
+                users=options['users'],
+                recipes=options['recipes'],
+                ingredients=options['ingredients'],
+                tags=options['tags'],
+                recipe_ingredients=options['recipe_ingredients'],
+                recipe_tags=options['recipe_tags'],
+                favorites=options['favorites'],
+                carts=options['carts'],
+                follows=options['follows'],
+                seed=options['seed'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Созданы пользователи: {}, рецепты: {}, ингредиенты: {}, '
+            'теги: {}. Пароль пользователей: {}'.format(
+                len(data['users']), len(data['recipes']),
+                len(data['ingredients']), len(data['tags']),
+                SAMPLE_PASSWORD,
+            )
+        ))
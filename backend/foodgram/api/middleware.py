@@ -0,0 +1,235 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('foodgram.timing')
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class Timings:
+    """Время этапов обработки одного запроса, секунд."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql = 0.0
+        self.serializer = 0.0
+        self.serializer_depth = 0
+        self.view_start = None
+        self.view = None
+        self.render_start = None
+        self.render = None
+        self.total = None
+
+    def view_finished(self):
+        """Представление вернуло ответ, дальше - рендеринг."""
+        self.render_start = time.perf_counter()
+        if self.view_start is not None:
+            self.view = self.render_start - self.view_start
+
+    def rendered(self):
+        if self.render_start is not None:
+            self.render = time.perf_counter() - self.render_start
+
+    def finish(self):
+        end = time.perf_counter()
+        self.total = end - self.start
+        if self.view is None and self.view_start is not None:
+            self.view = end - self.view_start
+
+    def metrics(self):
+        """Пары (название, миллисекунды) для заголовка и журнала."""
+        metrics = (
+            ('sql', self.sql),
+            ('view', self.view),
+            ('serializer', self.serializer),
+            ('render', self.render),
+            ('total', self.total),
+        )
+        return [
+            (name, round(value * 1000, 2))
+            for name, value in metrics if value is not None
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    """Обертка выполнения запросов: время SQL текущего запроса к API."""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.sql += time.perf_counter() - start
+        timings.sql_count += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    """Подключение ``record_query`` к соединению с базой один раз."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializer_timing():
+    """Учет времени сериализации; вложенные вызовы не учитываются
+    повторно."""
+    timings = current_timings.get()
+    if timings is None or timings.serializer_depth:
+        yield
+        return
+    timings.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.serializer += time.perf_counter() - start
+        timings.serializer_depth -= 1
+
+
+class TimedSerializerMixin:
+    """Время проверки входных данных и представления объектов."""
+
+    def run_validation(self, *args, **kwargs):
+        with serializer_timing():
+            return super().run_validation(*args, **kwargs)
+
+    def to_representation(self, instance):
+        with serializer_timing():
+            return super().to_representation(instance)
+
+
+@lru_cache(maxsize=None)
+def timed_serializer_class(serializer_class):
+    """Подкласс ``serializer_class`` с учетом времени сериализации."""
+    class TimedSerializer(TimedSerializerMixin, serializer_class):
+        pass
+
+    TimedSerializer.__name__ = serializer_class.__name__
+    TimedSerializer.__qualname__ = serializer_class.__qualname__
+    TimedSerializer.__module__ = serializer_class.__module__
+    return TimedSerializer
+
+
+class RequestTimingMiddleware:
+    """Время SQL, представления, сериализации и рендеринга ответа.
+
+    Включается настройкой ``REQUEST_TIMING``; значения отдаются в
+    заголовке ``Server-Timing`` и пишутся в журнал ``foodgram.timing``
+    одной строкой JSON. Время представления включает время SQL и
+    сериализации; их замеряет ``api.mixins.TimingMixin``. Для
+    потокового ответа запросы к базе считаются и во время отдачи
+    содержимого, а строка журнала пишется после отдачи, без заголовка.
+    Когда настройка выключена, middleware не подключается.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = Timings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.report(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = Timings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.report(request, response, timings)
+
+    def report(self, request, response, timings):
+        if response.streaming:
+            if timings.render_start is None:
+                timings.view_finished()
+            stream = self.atimed_stream if response.is_async else (
+                self.timed_stream
+            )
+            response.streaming_content = stream(
+                response.streaming_content, request, response, timings
+            )
+            return response
+        timings.finish()
+        metrics = timings.metrics()
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={value}' + (
+                f';desc="{timings.sql_count} queries"' if name == 'sql' else ''
+            )
+            for name, value in metrics
+        )
+        self.log(request, response, timings, metrics)
+        return response
+
+    def timed_stream(self, content, request, response, timings):
+        """Содержимое потокового ответа с учетом запросов при отдаче."""
+        content = iter(content)
+        try:
+            while True:
+                token = current_timings.set(timings)
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    break
+                finally:
+                    current_timings.reset(token)
+                yield chunk
+        finally:
+            self.stream_finished(request, response, timings)
+
+    async def atimed_stream(self, content, request, response, timings):
+        content = aiter(content)
+        try:
+            while True:
+                token = current_timings.set(timings)
+                try:
+                    chunk = await anext(content)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    current_timings.reset(token)
+                yield chunk
+        finally:
+            self.stream_finished(request, response, timings)
+
+    def stream_finished(self, request, response, timings):
+        timings.rendered()
+        timings.finish()
+        self.log(request, response, timings, timings.metrics())
+
+    def log(self, request, response, timings, metrics):
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'sql_count': timings.sql_count,
+            **{f'{name}_ms': value for name, value in metrics},
+        }))
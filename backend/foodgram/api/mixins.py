@@ -0,0 +1,269 @@
+import hashlib
+import math
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
+from django.http import Http404
+from django.shortcuts import aget_object_or_404
+from django.utils.cache import (get_conditional_response,
+                                patch_vary_headers, quote_etag)
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .cache import get_version, request_fingerprint, user_version
+from .middleware import current_timings, timed_serializer_class
+
+
+class ConditionalGetMixin:
+    """Условные запросы для list и retrieve: ETag и Last-Modified.
+
+    Валидаторы строятся из версий данных ``condition_versions`` и адреса
+    запроса без обращения к базе и сериализации, поэтому ответ 304
+    отдается до выполнения запросов к базе. Если в ответе есть признаки,
+    зависящие от пользователя (``user_specific``), учитывается и версия
+    его избранного и корзины. Ответ 304 отдается только по ETag:
+    Last-Modified точен до секунды, и изменение в ту же секунду не было
+    бы замечено по ``If-Modified-Since``.
+    """
+
+    condition_versions = ()
+    user_specific = False
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_condition_versions(self, request):
+        versions = list(self.condition_versions)
+        if self.user_specific and request.user.is_authenticated:
+            versions.append(user_version(request.user.pk))
+        return versions
+
+    def get_validators(self, request):
+        """ETag и время последнего изменения с округлением вверх."""
+        versions = [
+            get_version(name)
+            for name in self.get_condition_versions(request)
+        ]
+        fingerprint = '{}:{}:{}'.format(
+            request_fingerprint(request), request.user.pk, versions
+        )
+        etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+        return etag, math.ceil(max(versions))
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.aconditional_response(
+            super().alist, request, *args, **kwargs
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.aconditional_response(
+            super().aretrieve, request, *args, **kwargs
+        )
+
+    def conditional_response(self, method, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = method(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return self.set_validators(response, etag, last_modified)
+
+    async def aconditional_response(self, method, request, *args, **kwargs):
+        etag, last_modified = await sync_to_async(self.get_validators)(
+            request
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await method(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return self.set_validators(response, etag, last_modified)
+
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization', ))
+        return response
+
+
+class CachedReadMixin:
+    """Кэширование ответов list и retrieve для анонимных пользователей.
+
+    Ключ кэша содержит версию данных ``cache_version``, поэтому после
+    изменения данных старые ответы перестают использоваться и вытесняются
+    из кэша по таймауту.
+    """
+
+    cache_version = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().alist, request, *args, **kwargs
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().aretrieve, request, *args, **kwargs
+        )
+
+    def get_cache_key(self, request):
+        return 'response:{}:{}:{}'.format(
+            self.cache_version,
+            get_version(self.cache_version),
+            request_fingerprint(request),
+        )
+
+    def cached_response(self, method, request, *args, **kwargs):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        if not timeout or not request.user.is_anonymous:
+            return method(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = method(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout)
+        return response
+
+    async def acached_response(self, method, request, *args, **kwargs):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        if not timeout or not request.user.is_anonymous:
+            return await method(request, *args, **kwargs)
+        key = await sync_to_async(self.get_cache_key)(request)
+        data = await cache.aget(key)
+        if data is not None:
+            return Response(data)
+        response = await method(request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(key, response.data, timeout)
+        return response
+
+
+class CatalogMixin:
+    """Чтение справочника ``catalog`` из памяти процесса вместо базы."""
+
+    catalog = None
+
+    def filter_queryset(self, queryset):
+        if self.action == 'list':
+            return self.catalog.all()
+        return super().filter_queryset(queryset)
+
+    def get_object(self):
+        lookup = str(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        obj = self.catalog.get(int(lookup)) if lookup.isdigit() else None
+        if obj is None:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def aget_object(self):
+        return await sync_to_async(self.get_object)()
+
+
+class AsyncReadMixin:
+    """Асинхронные list и retrieve на асинхронном ORM Django.
+
+    ``alist`` и ``aretrieve`` повторяют ``list`` и ``retrieve`` DRF, но
+    читают рецепты, подписки и страницы через ``acount``, ``aget``
+    и асинхронный перебор QuerySet. Их вызывает представление из
+    ``api.async_views`` при запуске под ASGI. Фильтры выполняются
+    в потоке, так как могут обращаться к базе при проверке параметров.
+    """
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await sync_to_async(self.filter_queryset)(
+            self.get_queryset()
+        )
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        if isinstance(queryset, QuerySet):
+            queryset = [obj async for obj in queryset]
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        serializer = self.get_serializer(await self.aget_object())
+        return Response(serializer.data)
+
+    async def aget_object(self):
+        queryset = await sync_to_async(self.filter_queryset)(
+            self.get_queryset()
+        )
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await aget_object_or_404(
+                queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(
+            queryset, self.request, view=self
+        )
+
+
+class TimingMixin:
+    """Время представления, сериализации и рендеринга ответа.
+
+    Значения записываются в замеры ``api.middleware.RequestTimingMiddleware``
+    и только когда он подключен. Сериализация замеряется в подклассе
+    сериализатора, который создает ``get_serializer``: представления
+    переопределяют ``get_serializer_class`` без вызова родителя, поэтому
+    класс подменяется уже после него. Рендеринг замеряется после
+    ``finalize_response`` до окончания ``Response.render``.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        timings = current_timings.get()
+        if timings is not None:
+            timings.view_start = time.perf_counter()
+        super().initial(request, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        if current_timings.get() is None:
+            return super().get_serializer(*args, **kwargs)
+        serializer_class = timed_serializer_class(self.get_serializer_class())
+        kwargs.setdefault('context', self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        timings = current_timings.get()
+        if timings is not None:
+            timings.view_finished()
+            if isinstance(response, Response):
+                response.add_post_render_callback(
+                    lambda response: timings.rendered()
+                )
+        return response
@@ -1,6 +1,96 @@
-from rest_framework.pagination import PageNumberPagination
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class Pagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` на асинхронном ORM.
+
+        Количество объектов считается ``acount``, страница читается
+        асинхронным перебором QuerySet вместе с ``prefetch_related``.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        return list(self.page)
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Постраничный вывод рецептов по курсору.
+
+    Следующая страница выбирается условием по ``(pub_date, id)`` вместо
+    ``OFFSET``, общее количество рецептов не считается.
+    """
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+
+class RecipePagination(Pagination):
+    """Постраничный вывод рецептов.
+
+    По умолчанию используются номера страниц. Если в запросе передан
+    параметр ``cursor`` (для первой страницы - пустой), используется
+    курсор, ссылки next и previous которого сохраняют этот режим.
+    Курсор задает порядок ``(pub_date, id)``, поэтому результаты поиска
+    и подбора по ингредиентам, упорядоченные по релевантности, всегда
+    выводятся по номерам страниц.
+    """
+
+    cursor_query_param = RecipeCursorPagination.cursor_query_param
+    # Порядок по релевантности: поиск (recipes.search) и подбор
+    # по ингредиентам (api.filters).
+    ranked_ordering = ('-rank', '-coverage')
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def use_cursor(self, queryset, request):
+        if self.cursor_query_param not in request.query_params:
+            return False
+        return not set(queryset.query.order_by) & set(self.ranked_ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.use_cursor(queryset, request):
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = RecipeCursorPagination()
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view
+        )
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        if not self.use_cursor(queryset, request):
+            return await super().apaginate_queryset(queryset, request, view)
+        self.cursor_paginator = RecipeCursorPagination()
+        return await sync_to_async(self.cursor_paginator.paginate_queryset)(
+            queryset, request, view
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response_schema(schema)
+        return super().get_paginated_response_schema(schema)
@@ -0,0 +1,99 @@
+class PdfDocument:
+    """Минимальный PDF, записываемый последовательно.
+
+    Документ собирается без сторонних библиотек. Используется
+    стандартный шрифт Helvetica с таблицей кириллических глифов, поэтому
+    текст кодируется в cp1251. Объекты 1-3 (каталог, дерево страниц
+    и шрифт) известны заранее, дерево страниц и таблица ссылок
+    дописываются в конце, когда известны все страницы и смещения
+    объектов.
+    """
+
+    width = 595
+    height = 842
+
+    def __init__(self):
+        self.offsets = {}
+        self.position = 0
+        self.pages = []
+
+    def write(self, data):
+        self.position += len(data)
+        return data
+
+    def write_object(self, number, body):
+        self.offsets[number] = self.position
+        return self.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+
+    def next_number(self):
+        return max(self.offsets, default=3) + 1
+
+    @staticmethod
+    def cyrillic_differences():
+        """Имена глифов для кириллицы в кодировке cp1251."""
+        names = [b'168 /afii10023 184 /afii10071 192']
+        for first in (10017, 10065):
+            for offset in range(32):
+                names.append(b'/afii%d' % (first + offset + (offset >= 6)))
+        return b' '.join(names)
+
+    def header(self):
+        return b''.join((
+            self.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'),
+            self.write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>'),
+            self.write_object(3, (
+                b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+                b'/Encoding << /Type /Encoding '
+                b'/BaseEncoding /WinAnsiEncoding '
+                b'/Differences [%s] >> >>'
+            ) % self.cyrillic_differences()),
+        ))
+
+    def page(self, content):
+        content_number = self.next_number()
+        page_number = content_number + 1
+        self.pages.append(page_number)
+        return b''.join((
+            self.write_object(content_number, (
+                b'<< /Length %d >>\nstream\n%s\nendstream'
+            ) % (len(content), content)),
+            self.write_object(page_number, (
+                b'<< /Type /Page /Parent 2 0 R '
+                b'/MediaBox [0 0 %d %d] '
+                b'/Resources << /Font << /F1 3 0 R >> >> '
+                b'/Contents %d 0 R >>'
+            ) % (self.width, self.height, content_number)),
+        ))
+
+    def text_page(self, lines, font_size, leading):
+        """Страница со строками ``lines`` шрифтом Helvetica."""
+        content = [
+            b'BT',
+            b'/F1 %d Tf' % font_size,
+            b'%d TL' % leading,
+            b'50 %d Td' % (self.height - 36),
+        ]
+        for line in lines:
+            text = line.encode('cp1251', errors='replace')
+            text = (
+                text.replace(b'\\', b'\\\\')
+                .replace(b'(', b'\\(')
+                .replace(b')', b'\\)')
+            )
+            content.append(b"(%s) '" % text)
+        content.append(b'ET')
+        return self.page(b'\n'.join(content))
+
+    def trailer(self):
+        kids = b' '.join(b'%d 0 R' % number for number in self.pages)
+        pages = self.write_object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>'
+                                  % (kids, len(self.pages)))
+        xref_position = self.position
+        size = max(self.offsets) + 1
+        xref = [b'xref', b'0 %d' % size, b'0000000000 65535 f ']
+        for number in range(1, size):
+            xref.append(b'%010d 00000 n ' % self.offsets[number])
+        return pages + b'\n'.join(xref) + (
+            b'\ntrailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+            % (size, xref_position)
+        )
@@ -0,0 +1,102 @@
+import csv
+from abc import ABC, abstractmethod
+
+from rest_framework.renderers import BaseRenderer
+
+from .pdf import PdfDocument
+
+
+class Echo:
+    """Буфер для ``csv.writer``, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(ABC, BaseRenderer):
+    """Базовый формат выгрузки списка покупок.
+
+    Список отдается по частям методом ``stream``, ``render`` используется
+    DRF для ответов с ошибками в том же формате. Форматы определяют
+    ``stream_lines``.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            lines = [f'{key}: {value}' for key, value in data.items()]
+        else:
+            lines = [str(data)]
+        return b''.join(self.stream_lines(lines))
+
+    def stream(self, ingredients):
+        """Выгрузка строк вида (название, единица измерения, количество)."""
+        return self.stream_lines(
+            f'{name} - {amount} {measurement_unit}'
+            for name, measurement_unit, amount in ingredients
+        )
+
+    @abstractmethod
+    def stream_lines(self, lines):
+        """Части файла для строк текста."""
+
+
+class TxtRenderer(ShoppingListRenderer):
+    """Список покупок в текстовом файле."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream_lines(self, lines):
+        for line in lines:
+            yield f'{line}\n'.encode(self.charset)
+
+
+class CsvRenderer(ShoppingListRenderer):
+    """Список покупок в формате CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('Ингредиент', 'Количество', 'Единица измерения')
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.header).encode(self.charset)
+        for name, measurement_unit, amount in ingredients:
+            yield writer.writerow(
+                (name, amount, measurement_unit)
+            ).encode(self.charset)
+
+    def stream_lines(self, lines):
+        writer = csv.writer(Echo())
+        for line in lines:
+            yield writer.writerow((line, )).encode(self.charset)
+
+
+class PdfRenderer(ShoppingListRenderer):
+    """Список покупок в формате PDF.
+
+    Документ собирается постранично (см. ``api.pdf``): каждая страница
+    отправляется клиенту, как только набрано ``lines_per_page`` строк.
+    """
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    lines_per_page = 50
+    font_size = 12
+    leading = 16
+
+    def stream_lines(self, lines):
+        document = PdfDocument()
+        yield document.header()
+        page = []
+        for line in lines:
+            page.append(line)
+            if len(page) == self.lines_per_page:
+                yield document.text_page(page, self.font_size, self.leading)
+                page = []
+        if page or not document.pages:
+            yield document.text_page(page, self.font_size, self.leading)
+        yield document.trailer()
@@ -0,0 +1,178 @@
+import random
+import uuid
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+
+from recipes.counters import recount
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem, Tag)
+from users.models import Follow, User
+
+from .cache import (INGREDIENTS, RECIPE_INGREDIENTS, RECIPES, TAGS,
+                    bump_version, user_version)
+
+SAMPLE_PASSWORD = 'sample-password'
+# Слова для названий и описаний рецептов, чтобы поиск находил рецепты.
+DISHES = (
+    'Борщ', 'Щи', 'Солянка', 'Пироги', 'Блины', 'Сырники', 'Пельмени',
+    'Вареники', 'Котлеты', 'Голубцы', 'Салат', 'Оливье', 'Винегрет',
+    'Запеканка', 'Оладьи', 'Плов', 'Гуляш', 'Рагу', 'Каша', 'Уха',
+)
+ADDITIONS = (
+    'с капустой', 'с грибами', 'с курицей', 'с говядиной', 'с творогом',
+    'с картофелем', 'с яблоками', 'с рыбой', 'по-домашнему', 'постный',
+)
+STEPS = (
+    'Нарежьте овощи кубиками.', 'Обжарьте лук до золотистого цвета.',
+    'Отварите мясо в подсоленной воде.', 'Смешайте муку с яйцами.',
+    'Запекайте в духовке сорок минут.', 'Тушите на медленном огне.',
+    'Посолите и поперчите по вкусу.', 'Подавайте со сметаной и зеленью.',
+)
+
+
+def popularity(rng, count):
+    """Накопленные веса популярности ``count`` объектов.
+
+    Веса распределены по Парето: немногие объекты получают большую часть
+    ссылок, как авторы, рецепты и ингредиенты в реальных данных.
+    """
+    return list(accumulate(rng.paretovariate(1.16) for _ in range(count)))
+
+
+def weighted_sample(rng, population, weights, count):
+    """До ``count`` разных объектов, выбранных по накопленным весам."""
+    count = min(count, len(population))
+    chosen = {}
+    for _ in range(10):
+        if len(chosen) >= count:
+            break
+        for item in rng.choices(
+            population, cum_weights=weights, k=count - len(chosen)
+        ):
+            chosen[id(item)] = item
+    if len(chosen) < count:
+        rest = [item for item in population if id(item) not in chosen]
+        for item in rng.sample(rest, count - len(chosen)):
+            chosen[id(item)] = item
+    return list(chosen.values())
+
+
+def around(rng, mean):
+    """Случайное количество со средним ``mean``."""
+    return round(rng.expovariate(1 / mean)) if mean else 0
+
+
+def create_sample_data(users=20, recipes=200, ingredients=300, tags=5,
+                       recipe_ingredients=8, recipe_tags=2, favorites=10,
+                       carts=5, follows=5, seed=None):
+    """Синтетические данные для проверок производительности.
+
+    Количества ингредиентов и тегов рецепта, избранного, корзины и
+    подписок пользователя - средние значения. Авторы, рецепты и
+    ингредиенты выбираются по степенному закону: у немногих авторов
+    большая часть рецептов и подписчиков, немногие рецепты чаще
+    попадают в избранное и корзины.
+
+    Объекты создаются через ``bulk_create``, сигналы не вызываются,
+    поэтому в конце меняются версии кэша и пересчитываются списки
+    покупок и счетчики. Имена получают общий случайный префикс, чтобы данные
+    можно было создавать повторно в той же базе. Пароль всех
+    пользователей - ``SAMPLE_PASSWORD``.
+
+    Возвращает словарь со списками созданных объектов.
+    """
+    rng = random.Random(seed)
+    # Отдельный генератор для слов не меняет остальные данные при том же
+    # ``seed``.
+    words = random.Random(seed)
+    prefix = uuid.uuid4().hex[:8]
+    password = make_password(SAMPLE_PASSWORD)
+    user_objects = User.objects.bulk_create(
+        User(
+            email=f'{prefix}-{number}@example.com',
+            username=f'{prefix}-{number}',
+            first_name='Имя',
+            last_name='Фамилия',
+            password=password,
+        )
+        for number in range(users)
+    )
+    tag_objects = Tag.objects.bulk_create(
+        Tag(
+            name=f'{prefix}-{number}',
+            color=f'#{prefix}{number}',
+            slug=f'{prefix}-{number}',
+        )
+        for number in range(tags)
+    )
+    ingredient_objects = Ingredient.objects.bulk_create(
+        Ingredient(name=f'{prefix} {number}', measurement_unit='г')
+        for number in range(ingredients)
+    )
+    author_weights = popularity(rng, users)
+    recipe_objects = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=(
+                f'{words.choice(DISHES)} {words.choice(ADDITIONS)} '
+                f'{prefix} {number}'
+            ),
+            text=' '.join(words.sample(STEPS, 3)),
+            cooking_time=rng.randint(1, 180),
+        )
+        for number, author in enumerate(
+            rng.choices(user_objects, cum_weights=author_weights, k=recipes)
+        )
+    )
+    ingredient_weights = popularity(rng, ingredients)
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe_id=recipe.id, ingredient_id=ingredient.id,
+                         amount=rng.randint(1, 500))
+        for recipe in recipe_objects
+        for ingredient in weighted_sample(
+            rng, ingredient_objects, ingredient_weights,
+            rng.randint(
+                max(recipe_ingredients // 2, 1), recipe_ingredients * 3 // 2
+            )
+        )
+    )
+    tag_weights = popularity(rng, tags)
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe in recipe_objects
+        for tag in weighted_sample(
+            rng, tag_objects, tag_weights, rng.randint(1, recipe_tags)
+        )
+    )
+    recipe_weights = popularity(rng, recipes)
+    for model, count in ((Favorite, favorites), (ShoppingCart, carts)):
+        model.objects.bulk_create(
+            model(user_id=user.id, recipe_id=recipe.id)
+            for user in user_objects
+            for recipe in weighted_sample(
+                rng, recipe_objects, recipe_weights, around(rng, count)
+            )
+        )
+    Follow.objects.bulk_create(
+        Follow(user_id=user.id, author_id=author.id)
+        for user in user_objects
+        for author in weighted_sample(
+            rng, user_objects, author_weights, around(rng, follows)
+        )
+        if author != user
+    )
+    user_ids = [user.id for user in user_objects]
+    ShoppingListItem.objects.rebuild(user_ids)
+    recount()
+    for name in (
+        RECIPES, RECIPE_INGREDIENTS, TAGS, INGREDIENTS,
+        *map(user_version, user_ids)
+    ):
+        bump_version(name)
+    return {
+        'users': user_objects,
+        'tags': tag_objects,
+        'ingredients': ingredient_objects,
+        'recipes': recipe_objects,
+    }
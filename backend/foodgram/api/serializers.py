@@ -1,11 +1,20 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from recipes.images import pending_upload, process_upload
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.signals import bulk_changes
+from recipes.tasks import submit
 from users.models import Follow, User
 
+from .cache import RECIPE_INGREDIENTS, bump_version
+from .catalog import ingredient_catalog, tag_catalog
+from .fields import CatalogRelatedField, DeferredBase64ImageField
+
 
 class UserCustomCreateSerializer(UserCreateSerializer):
     """Сериализатор для создания пользователя."""
@@ -47,8 +56,10 @@ class UserCustomSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
-        if user.is_anonymous:
+        if user.is_anonymous or user.id == obj.id:
             return False
         return Follow.objects.filter(
             user=user, author=obj).exists()
@@ -81,17 +92,22 @@ class FollowSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         user = self.context.get('request').user
-        author = obj.author
+        if obj.user_id == user.id:
+            return True
         if user.is_authenticated:
-            return Follow.objects.filter(user=user, author=author).exists()
+            return Follow.objects.filter(
+                user=user, author=obj.author
+            ).exists()
         return False
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        recipes = Recipe.objects.filter(author=obj.author)
-        limit = request.GET.get('recipes_limit')
-        if limit:
-            recipes = recipes[:int(limit)]
+        recipes = getattr(obj.author, 'prefetched_recipes', None)
+        if recipes is None:
+            recipes = obj.author.recipes.all()
+            limit = request.GET.get('recipes_limit')
+            if limit and limit.isdigit():
+                recipes = recipes[:int(limit)]
         return RecipeFieldSerializer(
             recipes,
             many=True,
@@ -99,7 +115,7 @@ class FollowSerializer(serializers.ModelSerializer):
         ).data
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author).count()
+        return obj.author.recipes_count
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -140,7 +156,8 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 class IngredientFieldSerializer(serializers.ModelSerializer):
     """Сериализатор для введения полей ингредиента при создании рецепта."""
 
-    id = serializers.PrimaryKeyRelatedField(
+    id = CatalogRelatedField(
+        catalog=ingredient_catalog,
         queryset=Ingredient.objects.all(),
     )
     amount = serializers.IntegerField()
@@ -150,7 +167,41 @@ class IngredientFieldSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class ImageVariantsSerializer(serializers.ModelSerializer):
+    """Уменьшенные копии картинки рецепта.
+
+    ``image_thumb`` - самая маленькая копия в JPEG, ``srcset`` - копии
+    в WebP для атрибута srcset. Пока копии не созданы, вместо миниатюры
+    отдается оригинал.
+    """
+
+    image_thumb = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+
+    def build_url(self, name):
+        url = Recipe._meta.get_field('image').storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def get_image_thumb(self, obj):
+        if not obj.image:
+            return None
+        if not obj.has_image_variants():
+            return self.build_url(obj.image.name)
+        return self.build_url(obj.image_variants['sizes'][0]['jpeg'])
+
+    def get_srcset(self, obj):
+        if not obj.image or not obj.has_image_variants():
+            return None
+        return ', '.join(
+            f'{self.build_url(variant["webp"])} {variant["width"]}w'
+            for variant in obj.image_variants['sizes']
+        )
+
+
+class RecipeSerializer(ImageVariantsSerializer):
     """Сериализатор для просмотра рецептов."""
 
     tags = TagSerializer(many=True, read_only=True)
@@ -167,43 +218,51 @@ class RecipeSerializer(serializers.ModelSerializer):
             'author',
             'name',
             'image',
+            'image_thumb',
+            'srcset',
             'text',
             'ingredients',
             'tags',
             'cooking_time',
             'is_favorited',
             'is_in_shopping_cart',
+            'image_status',
         )
 
     def get_ingredients(self, obj):
-        ingredients = RecipeIngredient.objects.filter(recipe=obj)
-        return RecipeIngredientSerializer(ingredients, many=True).data
+        return RecipeIngredientSerializer(
+            obj.recipe_ingredients.all(), many=True
+        ).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return user.favorites.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
-        if request is None or request.user.is_authenticated:
-            return ShoppingCart.objects.filter(
-                user=request.user,
-                recipe=obj
-            ).exists()
-        return False
+        if request is None or request.user.is_anonymous:
+            return False
+        return ShoppingCart.objects.filter(
+            user=request.user,
+            recipe=obj
+        ).exists()
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания рецепта."""
 
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
+    tags = CatalogRelatedField(
+        catalog=tag_catalog, queryset=Tag.objects.all(), many=True
     )
     ingredients = IngredientFieldSerializer(many=True)
     author = UserCustomSerializer(read_only=True)
-    image = Base64ImageField()
+    image = DeferredBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -240,58 +299,133 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
         return data
 
+    def bump_recipe_ingredients_version(self):
+        """Новая версия состава рецептов: ``bulk_create`` не отправляет
+        сигналы."""
+        transaction.on_commit(lambda: bump_version(RECIPE_INGREDIENTS))
+
     def create_ingredients(self, ingredients, recipe):
-        """Создание ингредиентов."""
-        for ingredient in ingredients:
-            ingredient_id = ingredient['id']
-            amount = ingredient['amount']
-            RecipeIngredient.objects.create(
-                recipe=recipe, ingredient=ingredient_id, amount=amount
+        """Создание ингредиентов одним запросом."""
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredient['id'],
+                amount=ingredient['amount']
             )
+            for ingredient in ingredients
+        )
+        self.bump_recipe_ingredients_version()
+
+    def update_ingredients(self, ingredients, recipe):
+        """Обновление ингредиентов рецепта.
 
-    def create_tags(self, tags, recipe):
-        """Создание тегов."""
-        for tag in tags:
-            recipe.tags.add(tag)
+        Удаляются, изменяются и создаются только отличающиеся строки.
+        Возвращает прежние и новые количества ингредиентов.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in recipe.recipe_ingredients.all()
+        }
+        old_amounts = {
+            ingredient_id: item.amount
+            for ingredient_id, item in current.items()
+        }
+        new_amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        RecipeIngredient.objects.filter(pk__in=[
+            item.pk for ingredient_id, item in current.items()
+            if ingredient_id not in new_amounts
+        ]).delete()
+        changed = []
+        for ingredient_id, amount in new_amounts.items():
+            item = current.get(ingredient_id)
+            if item is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        RecipeIngredient.objects.bulk_update(changed, ('amount', ))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amount
+            )
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in current
+        )
+        if current.keys() != new_amounts.keys():
+            self.bump_recipe_ingredients_version()
+        return old_amounts, new_amounts
 
+    @transaction.atomic
     def create(self, validated_data):
         """Создание рецепта."""
         author = self.context.get('request').user
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(author=author, **validated_data)
-        self.create_tags(tags, recipe)
+        image = validated_data.pop('image')
+        recipe = Recipe.objects.create(
+            author=author,
+            image_status=Recipe.IMAGE_PROCESSING,
+            image_upload=pending_upload(image),
+            **validated_data
+        )
+        recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        submit(process_upload, recipe.pk)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Обновление рецепта."""
-        instance.image = validated_data.get('image', instance.image)
+        """Обновление рецепта.
+
+        Сохраняются только изменяемые здесь поля: готовую картинку
+        записывает фоновая обработка, и полное сохранение могло бы
+        перезаписать ее устаревшими значениями.
+        """
+        fields = ['name', 'text', 'cooking_time']
+        image = validated_data.get('image')
+        if image is not None:
+            instance.image_status = Recipe.IMAGE_PROCESSING
+            instance.image_upload = pending_upload(image)
+            fields += ['image_status', 'image_upload']
+            submit(process_upload, instance.pk)
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get(
             'cooking_time', instance.cooking_time
         )
 
-        instance.tags.clear()
         tags = validated_data.get('tags')
-        self.create_tags(tags, instance)
+        if tags is not None:
+            instance.tags.set(tags)
 
-        RecipeIngredient.objects.filter(recipe=instance).all().delete()
         ingredients = validated_data.get('ingredients')
-        self.create_ingredients(ingredients, instance)
+        if ingredients is not None:
+            with bulk_changes():
+                amounts = self.update_ingredients(ingredients, instance)
+            ShoppingListItem.objects.change_recipe(instance, *amounts)
 
-        instance.save()
+        instance.save(update_fields=fields)
         return instance
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        prefetch_related_objects(
+            (instance, ),
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
         return RecipeSerializer(
             instance, context=context).data
 
 
-class RecipeFieldSerializer(serializers.ModelSerializer):
+class RecipeFieldSerializer(ImageVariantsSerializer):
     """Сериализатор для получения полей рецепта."""
 
     class Meta:
@@ -300,6 +434,8 @@ class RecipeFieldSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_thumb',
+            'srcset',
             'cooking_time',
         )
 
@@ -332,3 +468,15 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             instance.recipe,
             context={'request': self.context.get('request')}
         ).data
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Идентификаторы рецептов для действий с несколькими рецептами."""
+
+    MAX_RECIPES = 100
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_RECIPES,
+    )
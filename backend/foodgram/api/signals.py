@@ -0,0 +1,94 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from recipes.images import image_processed
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import User
+
+from .cache import (INGREDIENTS, RECIPE_INGREDIENTS, RECIPES, TAGS,
+                    bump_version, user_version)
+
+# Поля автора, которые выводятся в рецептах.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    """Новая версия справочника ингредиентов для всех воркеров."""
+    transaction.on_commit(lambda: bump_version(INGREDIENTS))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(**kwargs):
+    """Новая версия справочника тегов для всех воркеров."""
+    transaction.on_commit(lambda: bump_version(TAGS))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def bump_user_version(instance, **kwargs):
+    """Новая версия избранного и корзины пользователя."""
+    name = user_version(instance.user_id)
+    transaction.on_commit(lambda: bump_version(name))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(image_processed, sender=Recipe)
+def bump_recipes_version(**kwargs):
+    """Новая версия рецептов после фиксации транзакции.
+
+    Версия меняется после фиксации, чтобы в кэш не попал ответ,
+    прочитанный до того, как изменения стали видны.
+    """
+    transaction.on_commit(lambda: bump_version(RECIPES))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver(post_delete, sender=Recipe)
+def bump_recipe_ingredients_version(**kwargs):
+    """Новая версия состава рецептов для индекса ингредиентов."""
+    transaction.on_commit(lambda: bump_version(RECIPE_INGREDIENTS))
+
+
+@receiver(post_save, sender=Recipe)
+def bump_recipe_ingredients_version_on_create(created, **kwargs):
+    if created:
+        bump_recipe_ingredients_version()
+
+
+@receiver(pre_save, sender=User)
+def check_author_change(instance, update_fields=None, **kwargs):
+    """Изменились ли данные автора, которые выводятся в рецептах.
+
+    Сохраненные значения читаются только для существующего пользователя
+    и только если сохраняется хотя бы одно из полей ``AUTHOR_FIELDS``.
+    """
+    instance.author_changed = False
+    if instance._state.adding:
+        return
+    fields = set(AUTHOR_FIELDS)
+    if update_fields is not None and not fields.intersection(update_fields):
+        return
+    saved = User.objects.filter(pk=instance.pk).values_list(
+        'recipes_count', *AUTHOR_FIELDS
+    ).first()
+    if saved is None:
+        return
+    recipes_count, *values = saved
+    instance.author_changed = bool(recipes_count) and values != [
+        getattr(instance, field) for field in AUTHOR_FIELDS
+    ]
+
+
+@receiver(post_save, sender=User)
+def bump_recipes_version_on_author_change(instance, **kwargs):
+    """Новая версия рецептов, если автор рецептов изменил имя или почту."""
+    if getattr(instance, 'author_changed', False):
+        bump_recipes_version()
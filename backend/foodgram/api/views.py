@@ -1,6 +1,6 @@
-from django.db import IntegrityError
-from django.db.models import Sum, F
-from django.http.response import HttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Prefetch, Value
+from django.http.response import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
@@ -10,13 +10,21 @@ from rest_framework.permissions import (SAFE_METHODS, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
+from recipes.counters import change_counter
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.signals import bulk_changes
 from users.models import Follow, User
 
+from .cache import INGREDIENTS, RECIPES, TAGS, bump_version, user_version
+from .catalog import ingredient_catalog, tag_catalog
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import Pagination
+from .indexes import ingredient_index
+from .mixins import (AsyncReadMixin, CachedReadMixin, CatalogMixin,
+                     ConditionalGetMixin, TimingMixin)
+from .pagination import Pagination, RecipePagination
 from .permissions import IsAuthorOrReadOnly
+from .renderers import CsvRenderer, PdfRenderer, TxtRenderer
 from .serializers import (
     FollowSerializer,
     IngredientSerializer,
@@ -25,16 +33,28 @@ from .serializers import (
     TagSerializer,
     UserCustomSerializer,
     RecipeFieldSerializer,
+    RecipeIdsSerializer,
 )
 
 
-class UserCustomViewSet(UserViewSet):
+class UserCustomViewSet(TimingMixin, UserViewSet):
     """Создание и получение данных пользователя."""
 
     queryset = User.objects.all()
     serializer_class = UserCustomSerializer
     pagination_class = Pagination
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset
+        return queryset.annotate(
+            is_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef('pk'))
+            )
+        )
+
     @action(
         detail=True,
         methods=('post', 'delete'),
@@ -75,19 +95,49 @@ class UserCustomViewSet(UserViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    def get_subscriptions(self, request):
+        """Подписки пользователя.
+
+        Рецепты всех авторов страницы загружаются одним запросом
+        с ограничением ``recipes_limit`` на каждого автора.
+        """
+        recipes = Recipe.objects.all()
+        limit = request.query_params.get('recipes_limit')
+        if limit and limit.isdigit():
+            recipes = recipes[:int(limit)]
+        return (
+            Follow.objects
+            .filter(user=request.user)
+            .select_related('author')
+            .prefetch_related(Prefetch(
+                'author__recipes',
+                queryset=recipes,
+                to_attr='prefetched_recipes',
+            ))
+            .order_by('id')
+        )
+
     @action(detail=False, permission_classes=(IsAuthenticated, ))
     def subscriptions(self, request):
         """Получение списка подписок."""
-        user = request.user
-        queryset = Follow.objects.filter(user=user)
-        pages = self.paginate_queryset(queryset)
+        pages = self.paginate_queryset(self.get_subscriptions(request))
+        serializer = FollowSerializer(
+            pages, many=True, context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    async def asubscriptions(self, request):
+        pages = await self.paginator.apaginate_queryset(
+            self.get_subscriptions(request), request, view=self
+        )
         serializer = FollowSerializer(
             pages, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(TimingMixin, ConditionalGetMixin, CatalogMixin,
+                        AsyncReadMixin, viewsets.ReadOnlyModelViewSet):
     """Получение списка ингредиентов."""
 
     queryset = Ingredient.objects.all()
@@ -96,28 +146,83 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     search_fields = ('^name', )
     permission_classes = (IsAuthenticatedOrReadOnly,)
+    condition_versions = (INGREDIENTS, )
+    catalog = ingredient_catalog
+    max_limit = 100
+
+    def filter_queryset(self, queryset):
+        """Поиск ингредиентов по индексу в памяти, без запросов к базе.
+
+        Параметр ``limit`` ограничивает число результатов; без него, как
+        и с большим значением, отдается не больше ``max_limit``.
+        """
+        if self.action != 'list':
+            return super().filter_queryset(queryset)
+        limit = self.request.query_params.get('limit', '')
+        limit = int(limit) if limit.isdigit() else 0
+        return ingredient_index.search(
+            self.request.query_params.get('name', ''),
+            min(limit or self.max_limit, self.max_limit)
+        )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(TimingMixin, ConditionalGetMixin, CatalogMixin,
+                 AsyncReadMixin, viewsets.ReadOnlyModelViewSet):
     """Получение списка тегов."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = None
+    condition_versions = (TAGS, )
+    catalog = tag_catalog
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(TimingMixin, ConditionalGetMixin, CachedReadMixin,
+                    AsyncReadMixin, viewsets.ModelViewSet):
     """Все действия с рецептами."""
 
+    cache_version = RECIPES
+    condition_versions = (RECIPES, )
+    user_specific = True
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = Pagination
+    pagination_class = RecipePagination
     permission_classes = (IsAuthorOrReadOnly,)
 
+    def get_queryset(self):
+        """Рецепты с признаками избранного и списка покупок.
+
+        Признаки вычисляются подзапросами ``EXISTS`` в основном запросе,
+        автор загружается через JOIN, а теги и ингредиенты - отдельными
+        запросами сразу для всей страницы, поэтому сериализатору не нужно
+        обращаться к базе для каждого рецепта.
+        """
+        queryset = self.queryset.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+        )
+
     def update(self, request, *args, **kwargs):
-        if kwargs['partial'] is False:
+        if not kwargs.get('partial'):
             return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
         return super().update(request, *args, **kwargs)
 
@@ -126,25 +231,121 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeSerializer
         return RecipeCreateSerializer
 
+    def lock_user(self, user):
+        """Блокировка строки пользователя до конца транзакции.
+
+        Добавления и удаления рецептов одного пользователя выполняются по
+        очереди, поэтому проверка перед изменением остается точной.
+        """
+        User.objects.select_for_update().filter(pk=user.pk).values_list(
+            'pk'
+        ).get()
+
     def add_to(self, model, user, pk):
-        if model.objects.filter(user=user, recipe__id=pk).exists():
-            return Response({'errors': 'Рецепт уже был добавлен.'},
-                            status=status.HTTP_400_BAD_REQUEST)
         recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(user=user, recipe=recipe)
+        with transaction.atomic():
+            self.lock_user(user)
+            if model.objects.filter(user=user, recipe=recipe).exists():
+                return Response({'errors': 'Рецепт уже был добавлен.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            model.objects.create(user=user, recipe=recipe)
         serializer = RecipeFieldSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete_from(self, model, user, pk):
-        obj = model.objects.filter(user=user, recipe__id=pk)
-        if obj.exists():
-            obj.delete()
+        with transaction.atomic():
+            self.lock_user(user)
+            deleted, _ = model.objects.filter(
+                user=user, recipe__id=pk
+            ).delete()
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {'errors': 'Рецепт уже был удален.'},
             status=status.HTTP_404_NOT_FOUND
         )
 
+    def add_many(self, model, user, ids):
+        """Добавление рецептов ``ids``: {рецепт: результат}.
+
+        Рецепты проверяются одним запросом и добавляются одним
+        ``bulk_create``.
+        """
+        with transaction.atomic():
+            self.lock_user(user)
+            added = dict(
+                Recipe.objects.filter(pk__in=ids).annotate(added=Exists(
+                    model.objects.filter(user=user, recipe=OuterRef('pk'))
+                )).values_list('pk', 'added')
+            )
+            new = [pk for pk in ids if added.get(pk) is False]
+            model.objects.bulk_create(
+                model(user=user, recipe_id=pk) for pk in new
+            )
+            self.after_change_many(model, user, new, 1)
+        return {
+            pk: (
+                'not_found' if pk not in added
+                else 'already_added' if added[pk] else 'added'
+            )
+            for pk in ids
+        }
+
+    def delete_many(self, model, user, ids):
+        """Удаление рецептов ``ids``: {рецепт: результат}."""
+        with transaction.atomic():
+            self.lock_user(user)
+            found = set(
+                model.objects.filter(user=user, recipe__in=ids)
+                .values_list('recipe_id', flat=True)
+            )
+            removed = [pk for pk in ids if pk in found]
+            if removed:
+                with bulk_changes():
+                    model.objects.filter(
+                        user=user, recipe__in=removed
+                    ).delete()
+            self.after_change_many(model, user, removed, -1)
+        return {
+            pk: 'removed' if pk in found else 'not_found' for pk in ids
+        }
+
+    def after_change_many(self, model, user, ids, delta):
+        """Изменения, которые для одного рецепта делают сигналы.
+
+        ``bulk_create`` сигналы не отправляет, а при удалении внутри
+        ``bulk_changes`` сигналы их не меняют, поэтому счетчики, список
+        покупок и версия данных пользователя обновляются здесь.
+        """
+        if not ids:
+            return
+        if model is Favorite:
+            change_counter(Recipe, ids, 'favorites_count', delta)
+        elif delta > 0:
+            ShoppingListItem.objects.add_recipes((user, ), ids)
+        else:
+            ShoppingListItem.objects.remove_recipes((user, ), ids)
+        name = user_version(user.pk)
+        transaction.on_commit(lambda: bump_version(name))
+
+    def change_many(self, model, request):
+        """Добавление или удаление нескольких рецептов одним запросом.
+
+        Тело запроса - ``{"recipes": [id, ...]}``; в ответе для каждого
+        рецепта указан результат: added, already_added, removed или
+        not_found.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        if request.method == 'POST':
+            results = self.add_many(model, request.user, ids)
+        else:
+            results = self.delete_many(model, request.user, ids)
+        return Response({'results': [
+            {'id': pk, 'status': result} for pk, result in results.items()
+        ]})
+
     @action(
         detail=True,
         methods=('post', 'delete'),
@@ -201,29 +402,59 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(
         detail=False,
-        methods=('get', ),
+        methods=('post', 'delete'),
+        url_path='favorite',
+        url_name='favorite-many',
         permission_classes=(IsAuthenticated, )
     )
+    def favorite_many(self, request):
+        """Добавление в избранное или удаление нескольких рецептов."""
+        return self.change_many(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart',
+        url_name='shopping-cart-many',
+        permission_classes=(IsAuthenticated, )
+    )
+    def shopping_cart_many(self, request):
+        """Добавление в список покупок или удаление нескольких рецептов."""
+        return self.change_many(ShoppingCart, request)
+
+    @action(
+        detail=False,
+        methods=('get', ),
+        permission_classes=(IsAuthenticated, ),
+        renderer_classes=(TxtRenderer, CsvRenderer, PdfRenderer),
+    )
     def download_shopping_cart(self, request):
-        """Скачивание ингредиентов из списка покупок."""
+        """Скачивание ингредиентов из списка покупок.
+
+        Формат файла выбирается параметром ``format`` (txt, csv или pdf).
+        Количества читаются из заранее посчитанного списка покупок
+        пользователя. Файл отдается по частям по мере чтения строк из
+        базы, поэтому весь список не собирается в памяти.
+        """
         ingredients = (
-            RecipeIngredient.objects
-            .filter(recipe__favorite_shops__user=request.user)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(amount=Sum(F('amount')))
-            .order_by()
+            ShoppingListItem.objects
+            .filter(user=request.user)
+            .values_list(
+                'ingredient__name',
+                'ingredient__measurement_unit',
+                'total_amount'
+            )
+            .order_by('ingredient__name')
+            .iterator()
         )
-        shop_list = []
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            measurement_unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['amount']
-            shop_list.append(
-                f'\n{name} - {amount} {measurement_unit}')
-        result = 'shop_list.txt'
-        response = HttpResponse(
-            shop_list,
-            content_type='text/plain'
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients),
+            content_type=content_type
         )
+        result = f'shop_list.{renderer.format}'
         response['Content-Disposition'] = f'attachment; filename={result}'
         return response
@@ -0,0 +1,21 @@
+class CountersMixin:
+    """Модель со счетчиками, которые меняются только через ``F()``.
+
+    Полное сохранение объекта не перезаписывает счетчики из
+    ``counter_fields`` значениями, прочитанными ранее, иначе терялись бы
+    изменения, сделанные другими запросами. Отложенные поля тоже не
+    сохраняются.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
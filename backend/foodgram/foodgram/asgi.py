@@ -12,5 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+# Под ASGI чтение основных списков выполняется асинхронными представлениями.
+os.environ.setdefault('ASYNC_VIEWS', '1')
+# Каждый запрос ASGI выполняется в новом потоке, поэтому соединения
+# с базой берутся из пула, а не открываются заново.
+os.environ.setdefault('DB_POOL', '1')
 
 application = get_asgi_application()
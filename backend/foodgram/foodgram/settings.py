@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -26,6 +27,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
@@ -38,6 +40,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +74,10 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Время жизни соединения с базой, секунд: 0 - новое соединение на каждый
+# запрос, none - без ограничения.
+DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', default='0').lower()
+
 DATABASES = {
     'default': {
         'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
@@ -78,10 +85,83 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='2741001'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default=5432)
+        'PORT': os.getenv('DB_PORT', default=5432),
+        'CONN_MAX_AGE': (
+            None if DB_CONN_MAX_AGE == 'none' else int(DB_CONN_MAX_AGE)
+        ),
+        # Проверка сохраненного соединения перед первым запросом к базе.
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default=''
+        ).lower() in ('1', 'true', 'yes'),
+    }
+}
+
+# Пул соединений psycopg внутри процесса, только для PostgreSQL. Под ASGI
+# каждый запрос выполняется в новом потоке, и соединения, сохраненные по
+# CONN_MAX_AGE, не переиспользуются; пул отдает открытые соединения любому
+# потоку воркера. С пулом CONN_MAX_AGE не используется.
+DB_POOL = os.getenv('DB_POOL', default='').lower() in ('1', 'true', 'yes')
+if DB_POOL and DATABASES['default']['ENGINE'].endswith('postgresql'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', default=2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', default=10)),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', default=10)),
+        },
+    }
+
+# Cache
+# Кэш общий для всех воркеров gunicorn: в нем хранятся версии данных,
+# по которым воркеры перечитывают справочники и проверяют ETag, и ответы
+# API. По умолчанию - файлы во временном каталоге контейнера.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'foodgram_cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', default=10000)),
+        },
     }
 }
 
+# Время хранения ответов API в кэше, секунд; 0 отключает кэширование.
+# Кэш в памяти процесса (LocMemCache) у каждого воркера свой, поэтому
+# с ним ответы не кэшируются.
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=600))
+if CACHES['default']['BACKEND'].endswith('.LocMemCache'):
+    RESPONSE_CACHE_TIMEOUT = 0
+
+# Заголовок Server-Timing и журнал foodgram.timing со временем SQL,
+# представления, сериализации и рендеринга для каждого запроса.
+REQUEST_TIMING = os.getenv('REQUEST_TIMING', default='').lower() in (
+    '1', 'true', 'yes'
+)
+
+# Асинхронное чтение рецептов, тегов, ингредиентов и подписок под ASGI
+# (см. api.async_views). По умолчанию включается в foodgram/asgi.py.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', default='').lower() in (
+    '1', 'true', 'yes'
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -122,6 +202,8 @@ DJOSER = {
         'user': ['djoser.permissions.CurrentUserOrAdminOrReadOnly'],
     },
     'HIDE_USERS': False,
+    'PASSWORD_RESET_CONFIRM_URL': 'password/reset/confirm/{uid}/{token}',
+    'USERNAME_RESET_CONFIRM_URL': 'email/reset/confirm/{uid}/{token}',
 }
 
 # Internationalization
@@ -149,6 +231,22 @@ else:
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Ширина уменьшенных копий картинок рецептов и качество сжатия.
+RECIPE_IMAGE_WIDTHS = (320, 640)
+RECIPE_IMAGE_QUALITY = 80
+
+# Картинки рецептов обрабатываются в фоновых потоках воркера;
+# 0 - обработка сразу после сохранения рецепта, в потоке запроса.
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', default=2))
+# Максимальный размер картинки в base64, байт.
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', default=10 * 1024 * 1024)
+)
+
+# Файл справочника ингредиентов для команды load_ingredients, если путь
+# не передан аргументом.
+INGREDIENTS_FILE = os.getenv('INGREDIENTS_FILE', default='')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,23 @@
+import os
+
+bind = '0:8000'
+
+# По умолчанию приложение WSGI в воркерах с потоками; ASGI=1 запускает
+# приложение ASGI в воркерах uvicorn с асинхронным чтением списков.
+if os.getenv('ASGI', default='').lower() in ('1', 'true', 'yes'):
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+    worker_class = 'gthread'
+    threads = int(os.getenv('GUNICORN_THREADS', default=4))
+
+
+def post_worker_init(worker):
+    """Загрузка справочников и индексов в память до первого запроса."""
+    from api.catalog import tag_catalog
+    from api.indexes import ingredient_index, recipe_ingredient_index
+
+    tag_catalog.load()
+    ingredient_index.load()
+    recipe_ingredient_index.load()
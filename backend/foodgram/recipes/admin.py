@@ -3,6 +3,8 @@ from django.contrib.auth.models import Group
 
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCart, Tag)
+from .paginators import EstimatedCountPaginator
+from .search import search_condition
 
 admin.site.unregister(Group)
 
@@ -10,6 +12,7 @@ admin.site.unregister(Group)
 class RecipeInIngredientAdmin(admin.TabularInline):
     model = RecipeIngredient
     fields = ('ingredient', 'amount')
+    autocomplete_fields = ('ingredient',)
     min_num = 1
     extra = 0
 
@@ -25,17 +28,34 @@ class RecipeAdmin(admin.ModelAdmin):
         'get_tags',
         'cooking_time',
         'count_favorite',)
-    list_filter = ('name', 'author', 'tags',)
+    list_select_related = ('author',)
+    list_filter = ('tags',)
     search_fields = (
-        'name',
-        'author__email',
-        'tags__name',
-        'ingredients__name',)
+        '=author__email',
+        '=author__username',)
+    autocomplete_fields = ('author',)
     inlines = (RecipeInIngredientAdmin,)
     readonly_fields = ('count_favorite',)
     empty_value_display = '-пусто-'
-
-    @admin.display(description='Автор')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            'tags', 'ingredients'
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по автору и полнотекстовый поиск по рецептам."""
+        found, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        condition = search_condition(search_term)
+        if condition is not None:
+            found |= queryset.filter(condition)
+        return found, may_have_duplicates
+
+    @admin.display(description='Автор', ordering='author__username')
     def get_author(self, obj):
         return obj.author.username
 
@@ -48,16 +68,20 @@ class RecipeAdmin(admin.ModelAdmin):
         return ', '.join([
             ingredient.name for ingredient in obj.ingredients.all()])
 
-    @admin.display(description='Количество избранного')
+    @admin.display(
+        description='Количество избранного',
+        ordering='favorites_count'
+    )
     def count_favorite(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
     search_fields = ('name',)
-    list_filter = ('name',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Tag)
@@ -71,19 +95,28 @@ class TagAdmin(admin.ModelAdmin):
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('=user__email', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('=user__email', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
-    search_fields = ('recipe', 'ingredient')
-    list_filter = ('recipe', 'ingredient')
+    list_select_related = ('recipe', 'ingredient')
+    search_fields = ('recipe__name', 'ingredient__name')
+    autocomplete_fields = ('recipe', 'ingredient')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
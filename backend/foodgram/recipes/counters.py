@@ -0,0 +1,58 @@
+from django.db.models import Count, F, OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Follow, User
+
+from .models import Favorite, Recipe
+
+# Счетчики: (модель, поле счетчика, модель строк, поле ссылки на объект).
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарное изменение счетчика ``field`` объекта ``pk`` на ``delta``.
+
+    ``pk`` может быть списком или QuerySet значений; счетчик не становится
+    отрицательным.
+    """
+    objects = model.objects.filter(
+        pk__in=pk if isinstance(pk, (list, tuple, set, QuerySet)) else (pk, )
+    )
+    objects.update(**{field: Greatest(F(field) + delta, Value(0))})
+
+
+def actual_count(source, link):
+    """Подзапрос с количеством строк ``source``, ссылающихся на объект."""
+    return Coalesce(
+        Subquery(
+            source.objects
+            .filter(**{link: OuterRef('pk')})
+            .order_by()
+            .values(link)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0
+    )
+
+
+def recount(check=False):
+    """Сверка счетчиков с таблицами и исправление расхождений.
+
+    Возвращает {(модель, поле): количество объектов с расхождением}.
+    При ``check=True`` счетчики не исправляются.
+    """
+    drift = {}
+    for model, field, source, link in COUNTERS:
+        objects = model.objects.exclude(**{field: actual_count(source, link)})
+        if check:
+            drift[model.__name__, field] = objects.count()
+        else:
+            drift[model.__name__, field] = objects.update(
+                **{field: actual_count(source, link)}
+            )
+    return drift
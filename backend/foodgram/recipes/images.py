@@ -0,0 +1,169 @@
+import base64
+import binascii
+import uuid
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+FORMATS = {'jpeg': 'jpg', 'webp': 'webp'}
+UPLOAD_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+# Картинка рецепта обработана в фоне; поля записаны через update(),
+# поэтому post_save не отправляется.
+image_processed = Signal()
+
+
+def variant_name(name, width, image_format):
+    """Имя уменьшенной копии: рядом с оригиналом, с шириной в имени."""
+    path = PurePosixPath(name)
+    return str(path.with_name(
+        f'{path.stem}_{width}.{FORMATS[image_format]}'
+    ))
+
+
+def encode(image, image_format):
+    buffer = BytesIO()
+    if image_format == 'jpeg':
+        image.convert('RGB').save(
+            buffer, 'JPEG', quality=settings.RECIPE_IMAGE_QUALITY,
+            optimize=True, progressive=True
+        )
+    else:
+        image.save(
+            buffer, 'WEBP', quality=settings.RECIPE_IMAGE_QUALITY, method=4
+        )
+    return buffer.getvalue()
+
+
+def generate_variants(image):
+    """Создание уменьшенных копий картинки рецепта в JPEG и WebP.
+
+    Копии сохраняются в то же хранилище рядом с оригиналом. Возвращает
+    словарь для ``Recipe.image_variants``: имя оригинала и список копий
+    с шириной и именами файлов.
+    """
+    with image.open('rb') as file:
+        source = ImageOps.exif_transpose(Image.open(file))
+        source.load()
+    variants = []
+    for width in settings.RECIPE_IMAGE_WIDTHS:
+        resized = source.copy()
+        resized.thumbnail((width, width), Image.LANCZOS)
+        variant = {'width': resized.width}
+        for image_format in FORMATS:
+            name = variant_name(image.name, width, image_format)
+            image.storage.delete(name)
+            variant[image_format] = image.storage.save(
+                name, ContentFile(encode(resized, image_format))
+            )
+        variants.append(variant)
+    return {'source': image.name, 'sizes': variants}
+
+
+def delete_variants(name, storage):
+    """Удаление уменьшенных копий картинки вместе с оригиналом."""
+    for width in settings.RECIPE_IMAGE_WIDTHS:
+        for image_format in FORMATS:
+            storage.delete(variant_name(name, width, image_format))
+
+
+def decode_image(payload):
+    """Имя файла и содержимое картинки из строки base64.
+
+    Строка может начинаться с заголовка ``data:image/...;base64,``.
+    Вызывает ValueError, если это не картинка поддерживаемого формата.
+    """
+    if payload.startswith('data:'):
+        payload = payload.partition(',')[2]
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except binascii.Error as error:
+        raise ValueError('Некорректная строка base64') from error
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image.verify()
+            image_format = image.format
+    except (OSError, SyntaxError, Image.DecompressionBombError) as error:
+        raise ValueError('Файл не является картинкой') from error
+    extension = UPLOAD_EXTENSIONS.get(image_format)
+    if extension is None:
+        raise ValueError(f'Формат {image_format} не поддерживается')
+    return f'{uuid.uuid4()}.{extension}', ContentFile(data)
+
+
+def pending_upload(payload):
+    """Файл для ``Recipe.image_upload`` со строкой base64 из запроса."""
+    return ContentFile(payload.encode(), name='upload.b64')
+
+
+def read_upload(upload):
+    """Имя файла и содержимое картинки из сохраненной загрузки."""
+    try:
+        with upload.open('rb') as file:
+            payload = file.read().decode('ascii')
+    except (OSError, UnicodeDecodeError) as error:
+        raise ValueError('Загрузка не найдена или повреждена') from error
+    return decode_image(payload)
+
+
+def delete_image(name, storage):
+    """Удаление картинки рецепта вместе с уменьшенными копиями."""
+    if name:
+        delete_variants(name, storage)
+        storage.delete(name)
+
+
+def process_upload(recipe_id):
+    """Фоновая обработка загруженной картинки рецепта.
+
+    Картинка из ``image_upload`` декодируется и проверяется, сохраняется
+    вместе с уменьшенными копиями, после чего рецепт получает статус
+    ``ready`` (или ``failed``, если картинка некорректна). Поля картинки
+    записываются через ``update()`` и только если загрузку не сменила
+    более новая: остальные поля рецепта, которые могли измениться
+    за время обработки, не перезаписываются.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image_upload:
+        return
+    upload = recipe.image_upload.name
+    storage = recipe.image_upload.storage
+    pending = Recipe.objects.filter(pk=recipe_id, image_upload=upload)
+    try:
+        name, content = read_upload(recipe.image_upload)
+    except ValueError:
+        if pending.update(image_status=Recipe.IMAGE_FAILED, image_upload=''):
+            storage.delete(upload)
+            image_processed.send(sender=Recipe, recipe_id=recipe_id)
+        return
+    previous = recipe.image.name
+    recipe.image.save(name, content, save=False)
+    variants = generate_variants(recipe.image)
+    if not pending.update(
+        image=recipe.image.name,
+        image_variants=variants,
+        image_status=Recipe.IMAGE_READY,
+        image_upload='',
+    ):
+        delete_image(recipe.image.name, recipe.image.storage)
+        return
+    delete_image(previous, recipe.image.storage)
+    storage.delete(upload)
+    image_processed.send(sender=Recipe, recipe_id=recipe_id)
+
+
+def update_variants(recipe_id):
+    """Фоновое создание уменьшенных копий текущей картинки рецепта."""
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image or recipe.has_image_variants():
+        return
+    if Recipe.objects.filter(pk=recipe_id, image=recipe.image.name).update(
+        image_variants=generate_variants(recipe.image)
+    ):
+        image_processed.send(sender=Recipe, recipe_id=recipe_id)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии картинок рецептов, где их нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать копии для всех рецептов.',
+        )
+
+    def handle(self, *args, **options):
+        created = 0
+        for recipe in Recipe.objects.exclude(image='').iterator():
+            if recipe.has_image_variants() and not options['force']:
+                continue
+            try:
+                variants = generate_variants(recipe.image)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'Рецепт {recipe.pk}: {error}')
+                continue
+            Recipe.objects.filter(pk=recipe.pk).update(
+                image_variants=variants
+            )
+            created += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Созданы копии картинок для рецептов: {created}.'
+        ))
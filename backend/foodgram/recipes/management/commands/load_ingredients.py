@@ -0,0 +1,169 @@
+import csv
+import io
+import json
+from argparse import ArgumentTypeError
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.cache import INGREDIENTS, RECIPES, bump_version
+from recipes.models import Ingredient
+
+
+def positive_int(value):
+    """Целое число больше нуля для аргументов командной строки."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise ArgumentTypeError(f'нужно целое число больше нуля: {value}')
+    return number
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает справочник ингредиентов из CSV или JSON файла. '
+        'Повторный запуск не создает дубликатов и обновляет '
+        'изменившиеся единицы измерения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            type=Path,
+            help=(
+                'Путь к ingredients.csv или ingredients.json; по умолчанию '
+                'берется из настройки INGREDIENTS_FILE.'
+            ),
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=positive_int,
+            default=1000,
+            help='Количество строк в одном INSERT.',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY в PostgreSQL.',
+        )
+
+    def read_csv(self, path):
+        with open(path, encoding='utf-8', newline='') as file:
+            for row in csv.reader(file):
+                if len(row) != 2:
+                    raise CommandError(f'Некорректная строка: {row}')
+                yield row
+
+    def read_json(self, path):
+        with open(path, encoding='utf-8') as file:
+            for item in json.load(file):
+                yield item['name'], item['measurement_unit']
+
+    def read(self, path):
+        """Уникальные пары (название, единица измерения) из файла."""
+        readers = {'.csv': self.read_csv, '.json': self.read_json}
+        reader = readers.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json')
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+        rows = {}
+        for name, measurement_unit in reader(path):
+            name, measurement_unit = name.strip(), measurement_unit.strip()
+            if name:
+                rows[name, measurement_unit] = None
+        return list(rows)
+
+    def plan(self, rows):
+        """Ингредиенты для обновления единицы измерения и для создания.
+
+        Единица измерения обновляется, если название встречается в файле
+        и в базе ровно по одному разу, но с разными единицами.
+        """
+        existing = {}
+        for ingredient in Ingredient.objects.all():
+            existing.setdefault(ingredient.name, []).append(ingredient)
+        units = {}
+        for name, measurement_unit in rows:
+            units.setdefault(name, []).append(measurement_unit)
+        to_update = []
+        for name, (measurement_unit, *others) in units.items():
+            ingredients = existing.get(name, [])
+            if others or len(ingredients) != 1:
+                continue
+            ingredient = ingredients[0]
+            if ingredient.measurement_unit != measurement_unit:
+                ingredient.measurement_unit = measurement_unit
+                to_update.append(ingredient)
+        known = {
+            (ingredient.name, ingredient.measurement_unit)
+            for ingredients in existing.values()
+            for ingredient in ingredients
+        }
+        to_create = [row for row in rows if row not in known]
+        return to_update, to_create
+
+    def copy(self, rows):
+        """Вставка строк командой COPY (только PostgreSQL).
+
+        С psycopg 3 строки передаются через ``Cursor.copy()``, с psycopg2 -
+        в формате CSV через ``copy_expert``.
+        """
+        sql = (
+            f'COPY {Ingredient._meta.db_table} (name, measurement_unit) '
+            'FROM STDIN'
+        )
+        with connection.cursor() as cursor:
+            if hasattr(cursor.cursor, 'copy'):
+                with cursor.cursor.copy(sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                return
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.cursor.copy_expert(f'{sql} WITH (FORMAT csv)', buffer)
+
+    def can_copy(self, options):
+        return not options['no_copy'] and connection.vendor == 'postgresql'
+
+    def bump_versions(self):
+        for name in (INGREDIENTS, RECIPES):
+            bump_version(name)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        path = options['path'] or settings.INGREDIENTS_FILE
+        if not path:
+            raise CommandError(
+                'Укажите путь к файлу или настройку INGREDIENTS_FILE.'
+            )
+        rows = self.read(Path(path))
+        with transaction.atomic():
+            to_update, to_create = self.plan(rows)
+            Ingredient.objects.bulk_update(
+                to_update, ('measurement_unit', ), batch_size=batch_size
+            )
+            if to_create and self.can_copy(options):
+                self.copy(to_create)
+            else:
+                Ingredient.objects.bulk_create(
+                    (
+                        Ingredient(name=name, measurement_unit=unit)
+                        for name, unit in to_create
+                    ),
+                    batch_size=batch_size
+                )
+            # bulk_create, bulk_update и COPY не отправляют сигналы,
+            # поэтому справочник в памяти воркеров и ответы с рецептами
+            # обновляются здесь.
+            transaction.on_commit(self.bump_versions)
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано: {len(rows)}, добавлено: {len(to_create)}, '
+            f'обновлено: {len(to_update)}.'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import process_upload
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Обрабатывает загруженные картинки рецептов, которые остались '
+        'в состоянии processing, например, после перезапуска воркера.'
+    )
+
+    def handle(self, *args, **options):
+        pending = list(Recipe.objects.filter(
+            image_status=Recipe.IMAGE_PROCESSING
+        ).exclude(image_upload='').values_list('pk', flat=True))
+        for recipe_id in pending:
+            process_upload(recipe_id)
+        failed = Recipe.objects.filter(
+            pk__in=pending, image_status=Recipe.IMAGE_FAILED
+        ).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработаны картинки рецептов: {len(pending)}, '
+            f'с ошибкой: {failed}.'
+        ))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает списки покупок по корзинам пользователей '
+        'и сверяет их с актуальными данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить списки покупок, не пересчитывая их.',
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='id пользователя; можно указать несколько раз.',
+        )
+
+    def handle(self, *args, **options):
+        users = options['users']
+        if not options['check']:
+            ShoppingListItem.objects.rebuild(users)
+            self.stdout.write('Списки покупок пересчитаны.')
+        mismatches = ShoppingListItem.objects.mismatches(users)
+        for (user, ingredient), (stored, live) in sorted(
+            mismatches.items()
+        ):
+            self.stdout.write(
+                f'Пользователь {user}, ингредиент {ingredient}: '
+                f'в таблице {stored}, по корзине {live}'
+            )
+        if mismatches:
+            raise CommandError(
+                f'Найдено расхождений: {len(mismatches)}.'
+            )
+        self.stdout.write(self.style.SUCCESS('Расхождений не найдено.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счетчики избранного, рецептов и подписчиков '
+        'с таблицами и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить счетчики, не исправляя их.',
+        )
+
+    def handle(self, *args, **options):
+        drift = recount(check=options['check'])
+        for (model, field), count in drift.items():
+            if count:
+                self.stdout.write(f'{model}.{field}: расхождений {count}')
+        total = sum(drift.values())
+        if options['check'] and total:
+            raise CommandError(f'Найдено расхождений: {total}.')
+        if total:
+            self.stdout.write(self.style.SUCCESS(
+                f'Исправлено счетчиков: {total}.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Расхождений не найдено.'))
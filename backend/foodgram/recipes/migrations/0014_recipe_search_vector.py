@@ -0,0 +1,139 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:32
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# SQL поиска на момент миграции; recipes.search не импортируется, чтобы
+# его изменения не меняли уже примененную миграцию.
+POSTGRESQL_INSTALL = (
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipe_search() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    'DROP TRIGGER IF EXISTS recipes_recipe_search ON recipes_recipe',
+    """
+    CREATE TRIGGER recipes_recipe_search
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search()
+    """,
+    'UPDATE recipes_recipe SET name = name',
+    """
+    CREATE INDEX IF NOT EXISTS recipe_search_idx
+    ON recipes_recipe USING gin (search_vector)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS recipe_name_trgm_idx
+    ON recipes_recipe USING gin (name gin_trgm_ops)
+    """,
+)
+POSTGRESQL_UNINSTALL = (
+    'DROP INDEX IF EXISTS recipe_name_trgm_idx',
+    'DROP INDEX IF EXISTS recipe_search_idx',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search()',
+)
+SQLITE_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_search_insert
+    AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_search(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_search_delete
+    AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_search(recipes_recipe_search, rowid,
+                                          name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_search_update
+    AFTER UPDATE OF name, text ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_search(recipes_recipe_search, rowid,
+                                          name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO recipes_recipe_search(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    """
+    INSERT INTO recipes_recipe_search(recipes_recipe_search)
+    VALUES ('rebuild')
+    """,
+)
+SQLITE_INSTALL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_search
+    USING fts5(name, text, content='recipes_recipe', content_rowid='id')
+    """,
+    *SQLITE_TRIGGERS,
+)
+SQLITE_UNINSTALL = (
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_update',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_delete',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_insert',
+    'DROP TABLE IF EXISTS recipes_recipe_search',
+)
+
+
+INSTALL = {'postgresql': POSTGRESQL_INSTALL, 'sqlite': SQLITE_INSTALL}
+UNINSTALL = {
+    'postgresql': POSTGRESQL_UNINSTALL, 'sqlite': SQLITE_UNINSTALL,
+}
+
+
+def execute(schema_editor, statements):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for sql in statements.get(connection.vendor, ()):
+            cursor.execute(sql)
+
+
+class TrigramExtension(TrigramExtension):
+    """Расширение pg_trgm; откат на других базах ничего не делает."""
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+def install_search(apps, schema_editor):
+    """Поисковый столбец или таблица FTS5 с триггерами и индексами.
+
+    Поисковые данные обновляются триггерами при изменении названия или
+    описания рецепта, в том числе при ``bulk_create`` и ``update``.
+    """
+    execute(schema_editor, INSTALL)
+
+
+def uninstall_search(apps, schema_editor):
+    execute(schema_editor, UNINSTALL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_favorites_count'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(install_search, uninstall_search),
+    ]
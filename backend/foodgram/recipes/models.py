@@ -1,6 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Sum
+
+from common.models import CountersMixin
 
 User = get_user_model()
 
@@ -54,7 +58,14 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeManager(models.Manager):
+    """Рецепты без поискового вектора, он нужен только в условиях."""
+
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+
+class Recipe(CountersMixin, models.Model):
     """
     Рецепты пользователей.
 
@@ -64,11 +75,25 @@ class Recipe(models.Model):
     author - привязка к автору рецепта
     name - название рецепта
     image - картинка рецепта
+    image_variants - уменьшенные копии картинки в JPEG и WebP
+    image_status - состояние фоновой обработки картинки
+    image_upload - загруженная строка base64, ожидающая обработки
+    favorites_count - количество добавлений в избранное
+    search_vector - поисковый вектор названия и описания (PostgreSQL)
     cooking_time - время приготовления
     tags - привязка к тегам
     ingredients - привязка к ингредиентам
     """
 
+    IMAGE_READY = 'ready'
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUSES = (
+        (IMAGE_READY, 'Готова'),
+        (IMAGE_PROCESSING, 'Обрабатывается'),
+        (IMAGE_FAILED, 'Ошибка обработки'),
+    )
+
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -87,6 +112,25 @@ class Recipe(models.Model):
         blank=True,
         help_text='Загрузите картинку'
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    image_status = models.CharField(
+        verbose_name='Состояние картинки',
+        max_length=20,
+        choices=IMAGE_STATUSES,
+        default=IMAGE_READY,
+        editable=False
+    )
+    image_upload = models.FileField(
+        verbose_name='Необработанная картинка',
+        upload_to='recipes/uploads/',
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Описание приготовления',
         help_text='Введите описание рецепта'
@@ -114,15 +158,43 @@ class Recipe(models.Model):
         verbose_name='Время приготовления (в минутах)',
         help_text='Введите время приготовления в минутах'
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Количество добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeManager()
+
+    counter_fields = ('favorites_count', )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def has_image_variants(self):
+        """Уменьшенные копии созданы для текущей картинки."""
+        return self.image_variants.get('source') == self.image.name
+
 
 class RecipeIngredient(models.Model):
     """Ингредиенты рецепта."""
@@ -221,3 +293,222 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} - {self.recipe}'
+
+
+class ShoppingListItemManager(models.Manager):
+    """Поддержка списков покупок в актуальном состоянии."""
+
+    # Попытки изменения при одновременном создании той же строки.
+    conflict_attempts = 3
+
+    def ingredient_amounts(self, recipe):
+        """Количества ингредиентов рецепта: {id ингредиента: количество}."""
+        return dict(
+            RecipeIngredient.objects
+            .filter(recipe=recipe)
+            .values_list('ingredient', 'amount')
+        )
+
+    def total_amounts(self, recipes):
+        """Суммы количеств ингредиентов нескольких рецептов."""
+        return dict(
+            RecipeIngredient.objects
+            .filter(recipe__in=recipes)
+            .values_list('ingredient')
+            .annotate(total=Sum('amount'))
+            .order_by()
+        )
+
+    def add_recipe(self, users, recipe):
+        """Добавление ингредиентов рецепта в списки покупок."""
+        self.apply_changes(users, self.ingredient_amounts(recipe))
+
+    def add_recipes(self, users, recipes):
+        """Добавление ингредиентов нескольких рецептов одним изменением."""
+        self.apply_changes(users, self.total_amounts(recipes))
+
+    def remove_recipe(self, users, recipe):
+        """Удаление ингредиентов рецепта из списков покупок."""
+        self.apply_changes(users, {
+            ingredient: -amount
+            for ingredient, amount in self.ingredient_amounts(recipe).items()
+        })
+
+    def remove_recipes(self, users, recipes):
+        """Удаление ингредиентов нескольких рецептов одним изменением."""
+        self.apply_changes(users, {
+            ingredient: -amount
+            for ingredient, amount in self.total_amounts(recipes).items()
+        })
+
+    def change_recipe(self, recipe, old_amounts, new_amounts=None):
+        """Учет изменения ингредиентов рецепта в корзинах пользователей."""
+        if new_amounts is None:
+            new_amounts = self.ingredient_amounts(recipe)
+        self.change_amounts(recipe, {
+            ingredient: (
+                new_amounts.get(ingredient, 0) - old_amounts.get(ingredient, 0)
+            )
+            for ingredient in {*old_amounts, *new_amounts}
+        })
+
+    def change_amounts(self, recipe, amounts):
+        """Изменение количеств ингредиентов рецепта в корзинах с ним."""
+        self.apply_changes(
+            ShoppingCart.objects.filter(recipe=recipe)
+            .values_list('user', flat=True),
+            amounts
+        )
+
+    def apply_changes(self, users, amounts):
+        """Изменение количеств ингредиентов в списках покупок.
+
+        ``amounts`` - словарь {id ингредиента: изменение количества}.
+        Затрагиваются только строки указанных пользователей и
+        ингредиентов, строки с нулевым количеством удаляются. Если строку
+        одновременно создал другой запрос, изменение повторяется уже
+        с этой строкой.
+        """
+        amounts = {key: value for key, value in amounts.items() if value}
+        if not amounts:
+            return
+        users = [getattr(user, 'pk', user) for user in users]
+        if not users:
+            return
+        for attempt in range(1, self.conflict_attempts + 1):
+            try:
+                with transaction.atomic():
+                    self.write_changes(users, amounts)
+                return
+            except IntegrityError:
+                if attempt == self.conflict_attempts:
+                    raise
+
+    def write_changes(self, users, amounts):
+        """Одна попытка ``apply_changes`` в текущей транзакции."""
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.select_for_update().filter(
+                user__in=users, ingredient__in=amounts
+            )
+        }
+        new_items = []
+        for user in users:
+            for ingredient, amount in amounts.items():
+                item = items.get((user, ingredient))
+                if item is None:
+                    new_items.append(self.model(
+                        user_id=user,
+                        ingredient_id=ingredient,
+                        total_amount=amount
+                    ))
+                else:
+                    item.total_amount += amount
+        self.bulk_create(
+            item for item in new_items if item.total_amount > 0
+        )
+        self.bulk_update(
+            [item for item in items.values() if item.total_amount > 0],
+            ('total_amount', )
+        )
+        self.filter(pk__in=[
+            item.pk for item in items.values() if item.total_amount <= 0
+        ]).delete()
+
+    def live_totals(self, users=None):
+        """Списки покупок, посчитанные по корзинам пользователей."""
+        # Одно условие на корзину: второй filter() по той же связи
+        # добавил бы второе соединение и размножил строки.
+        if users is None:
+            condition = {'recipe__favorite_shops__isnull': False}
+        else:
+            condition = {'recipe__favorite_shops__user__in': users}
+        return (
+            RecipeIngredient.objects.filter(**condition)
+            .values_list('recipe__favorite_shops__user', 'ingredient')
+            .annotate(total_amount=Sum('amount'))
+            .order_by()
+        )
+
+    def rebuild(self, users=None, batch_size=1000):
+        """Полный пересчет списков покупок по корзинам пользователей."""
+        items = self.all() if users is None else self.filter(user__in=users)
+        with transaction.atomic():
+            items.delete()
+            self.bulk_create(
+                (
+                    self.model(
+                        user_id=user,
+                        ingredient_id=ingredient,
+                        total_amount=total_amount
+                    )
+                    for user, ingredient, total_amount
+                    in self.live_totals(users).iterator()
+                ),
+                batch_size=batch_size
+            )
+
+    def mismatches(self, users=None):
+        """Расхождения таблицы с корзинами пользователей.
+
+        Возвращает словарь {(id пользователя, id ингредиента):
+        (количество в таблице, количество по корзинам)}.
+        """
+        items = self.all() if users is None else self.filter(user__in=users)
+        stored = {
+            (user, ingredient): total_amount
+            for user, ingredient, total_amount in items.values_list(
+                'user', 'ingredient', 'total_amount'
+            ).iterator()
+        }
+        live = {
+            (user, ingredient): total_amount
+            for user, ingredient, total_amount
+            in self.live_totals(users).iterator()
+        }
+        return {
+            key: (stored.get(key), live.get(key))
+            for key in stored.keys() | live.keys()
+            if stored.get(key) != live.get(key)
+        }
+
+
+class ShoppingListItem(models.Model):
+    """Ингредиент в списке покупок пользователя.
+
+    Суммарное количество ингредиента по всем рецептам из корзины
+    пользователя. Таблица обновляется сигналами (см. ``recipes.signals``)
+    при изменении корзины и рецептов в ней, в том числе через админку,
+    и читается при скачивании списка покупок.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество',
+    )
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.ingredient} - {self.total_amount}'
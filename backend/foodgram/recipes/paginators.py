@@ -0,0 +1,29 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки с приблизительным числом строк.
+
+    Для нефильтрованного списка в PostgreSQL число строк берется из
+    статистики таблицы вместо ``COUNT(*)``, если таблица больше
+    ``threshold`` строк. В остальных случаях строки считаются точно.
+    """
+
+    threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    (queryset.model._meta.db_table, )
+                )
+                row = cursor.fetchone()
+            if row is not None and row[0] >= self.threshold:
+                return int(row[0])
+        return super().count
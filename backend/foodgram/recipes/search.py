@@ -0,0 +1,146 @@
+import re
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramWordSimilarity)
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+# Словарь PostgreSQL со стеммингом русского языка.
+CONFIG = 'russian'
+WORD = re.compile(r'\w+')
+# Слова короче не ищутся по триграммам: у них почти нет триграмм.
+TRIGRAM_MIN_LENGTH = 3
+
+# Триггеры FTS5, которые ``repair`` создает заново. Миграция 0014 хранит
+# свою копию этого SQL, чтобы изменения модуля ее не меняли.
+SQLITE_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_search_insert
+    AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_search(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_search_delete
+    AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_search(recipes_recipe_search, rowid,
+                                          name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_search_update
+    AFTER UPDATE OF name, text ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_search(recipes_recipe_search, rowid,
+                                          name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO recipes_recipe_search(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    """
+    INSERT INTO recipes_recipe_search(recipes_recipe_search)
+    VALUES ('rebuild')
+    """,
+)
+
+
+def execute(db, statements):
+    with db.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def repair(db):
+    """Восстановление триггеров SQLite после пересоздания таблицы.
+
+    SQLite не умеет изменять столбцы, и миграции пересоздают таблицу
+    рецептов, удаляя ее триггеры; индекс FTS5 после этого строится
+    заново.
+    """
+    if db.vendor != 'sqlite':
+        return
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN "
+            "('recipes_recipe_search', 'recipes_recipe_search_insert')"
+        )
+        found = {name for name, in cursor.fetchall()}
+    if found == {'recipes_recipe_search'}:
+        execute(db, SQLITE_TRIGGERS)
+
+
+def search_query(text):
+    return SearchQuery(text, config=CONFIG, search_type='websearch')
+
+
+def trigram_words(words):
+    return [word for word in words if len(word) >= TRIGRAM_MIN_LENGTH]
+
+
+def fts_query(words):
+    """Запрос FTS5: все слова, каждое как префикс."""
+    return ' '.join('"{}"*'.format(word.replace('"', '')) for word in words)
+
+
+def search_condition(text):
+    """Условие поиска рецептов по строке ``text`` или None без слов.
+
+    В PostgreSQL используется ``tsvector`` со стеммингом по GIN-индексу,
+    а опечатки в названии находятся по сходству триграмм ``pg_trgm``:
+    каждое слово запроса должно быть похоже на слово названия. В SQLite -
+    таблица FTS5 с поиском по префиксам слов. Столбец ``text`` рецепта
+    при поиске не читается.
+    """
+    words = WORD.findall(text)
+    if not words:
+        return None
+    if connection.vendor == 'postgresql':
+        condition = Q(search_vector=search_query(text))
+        typos = trigram_words(words)
+        if typos:
+            condition |= Q(*(
+                Q(name__trigram_word_similar=word) for word in typos
+            ))
+        return condition
+    return Q(pk__in=RawSQL(
+        'SELECT rowid FROM recipes_recipe_search '
+        'WHERE recipes_recipe_search MATCH %s',
+        (fts_query(words), )
+    ))
+
+
+def search_rank(text):
+    """Релевантность рецепта: больше - лучше.
+
+    Название весит больше описания; в SQLite это bm25 со знаком минус.
+    """
+    words = WORD.findall(text)
+    if connection.vendor == 'postgresql':
+        return sum(
+            (
+                TrigramWordSimilarity(word, 'name')
+                for word in trigram_words(words)
+            ),
+            SearchRank(F('search_vector'), search_query(text))
+        )
+    return RawSQL(
+        'SELECT -bm25(recipes_recipe_search, 10.0, 1.0) '
+        'FROM recipes_recipe_search '
+        'WHERE recipes_recipe_search MATCH %s '
+        'AND recipes_recipe_search.rowid = recipes_recipe.id',
+        (fts_query(words), ),
+        output_field=FloatField(),
+    )
+
+
+def search_recipes(queryset, text):
+    """Рецепты по поисковой строке ``text``, самые релевантные первыми."""
+    condition = search_condition(text)
+    if condition is None:
+        return queryset
+    return queryset.filter(condition).annotate(
+        rank=search_rank(text)
+    ).order_by('-rank', '-pub_date', '-id')
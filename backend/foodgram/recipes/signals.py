@@ -0,0 +1,277 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.models import QuerySet
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django_cleanup.signals import cleanup_pre_delete
+
+from users.models import Follow, User
+
+from .counters import change_counter
+from .images import delete_variants, update_variants
+from .models import (Favorite, Recipe, RecipeIngredient, ShoppingCart,
+                     ShoppingListItem)
+from .search import repair
+from .tasks import submit
+
+in_bulk = ContextVar('in_bulk', default=False)
+
+
+@contextmanager
+def bulk_changes():
+    """Массовое изменение: списки покупок и счетчик избранного
+    обновляет вызывающий код.
+
+    Внутри блока сигналы не меняют списки покупок и ``favorites_count``,
+    например, при удалении строк одним ``QuerySet.delete()``; вызывающий
+    код сам учитывает изменения всех строк сразу.
+    """
+    token = in_bulk.set(True)
+    try:
+        yield
+    finally:
+        in_bulk.reset(token)
+
+
+def is_cascade(sender, origin):
+    """Строки удаляются вместе с объектом другой модели."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not sender
+
+
+def previous_values(instance, *fields):
+    """Значения полей сохраняемой строки в базе; None для новой строки."""
+    if instance._state.adding:
+        return None
+    return type(instance).objects.filter(pk=instance.pk).values_list(
+        *fields
+    ).first()
+
+
+@receiver(post_save, sender=Recipe)
+def update_image_variants(instance, **kwargs):
+    """Создание уменьшенных копий после загрузки новой картинки.
+
+    Копии создаются в фоновом потоке, например, для картинок,
+    загруженных через админку.
+    """
+    if instance.image and not instance.has_image_variants():
+        submit(update_variants, instance.pk)
+
+
+@receiver(cleanup_pre_delete)
+def delete_image_variants(file, **kwargs):
+    """Удаление уменьшенных копий, когда django-cleanup удаляет оригинал."""
+    if getattr(file, 'field', None) is Recipe._meta.get_field('image'):
+        delete_variants(file.name, file.storage)
+
+
+def counter_delta(signal, created=False, **kwargs):
+    """Изменение счетчика: +1 при создании строки, -1 при удалении."""
+    if signal is post_delete:
+        return -1
+    return 1 if created else 0
+
+
+# Поле строки, которое ссылается на объект со счетчиком.
+COUNTER_LINKS = {Favorite: 'recipe', Recipe: 'author', Follow: 'author'}
+
+
+@receiver(pre_save, sender=Favorite)
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=Follow)
+def remember_counter_link(sender, instance, update_fields=None, **kwargs):
+    """Объект счетчика до сохранения, например, прежний автор рецепта.
+
+    Значение читается из базы, только если сохраняется поле ссылки.
+    """
+    link = COUNTER_LINKS[sender]
+    instance.previous_link = None
+    if update_fields is None or link in update_fields:
+        previous = previous_values(instance, f'{link}_id')
+        instance.previous_link = previous and previous[0]
+
+
+def update_counter(model, field, link, instance, sender, origin=None,
+                   **kwargs):
+    """Изменение счетчика при создании, удалении и переносе строки.
+
+    Если строку перенесли к другому объекту (рецепт передали другому
+    автору), счетчик прежнего объекта уменьшается, а нового растет.
+    Строки, удаленные вместе с рецептом или пользователем, не
+    учитываются: счетчики оставшихся объектов уменьшает
+    ``remove_deleted_user``.
+    """
+    if origin is not None and is_cascade(sender, origin):
+        return
+    pk = getattr(instance, f'{link}_id')
+    delta = counter_delta(**kwargs)
+    if delta:
+        change_counter(model, pk, field, delta)
+        return
+    previous = getattr(instance, 'previous_link', None)
+    if previous is not None and previous != pk:
+        change_counter(model, previous, field, -1)
+        change_counter(model, pk, field, 1)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def update_favorites_count(instance, **kwargs):
+    """Количество добавлений рецепта в избранное."""
+    if in_bulk.get():
+        return
+    update_counter(Recipe, 'favorites_count', 'recipe', instance, **kwargs)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def update_recipes_count(instance, **kwargs):
+    """Количество рецептов автора."""
+    update_counter(User, 'recipes_count', 'author', instance, **kwargs)
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def update_followers_count(instance, **kwargs):
+    """Количество подписчиков автора."""
+    update_counter(User, 'followers_count', 'author', instance, **kwargs)
+
+
+@receiver(pre_delete, sender=User)
+def remove_deleted_user(instance, **kwargs):
+    """Счетчики авторов и рецептов, которые меняет удаление пользователя.
+
+    Избранное и подписки пользователя удаляются каскадом без изменения
+    счетчиков по одной строке; здесь счетчики уменьшаются двумя
+    запросами независимо от количества строк.
+    """
+    change_counter(
+        Recipe, instance.favorites.values('recipe'), 'favorites_count', -1
+    )
+    change_counter(
+        User, Follow.objects.filter(user=instance).values('author'),
+        'followers_count', -1
+    )
+
+
+@receiver(pre_save, sender=ShoppingCart)
+def remember_cart(instance, **kwargs):
+    instance.previous_values = previous_values(instance, 'user', 'recipe')
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    """Ингредиенты рецепта, добавленного в корзину, в списке покупок.
+
+    Если в корзине изменили пользователя или рецепт (например, в
+    админке), прежний рецепт вычитается из прежнего списка.
+    """
+    if in_bulk.get():
+        return
+    current = (instance.user_id, instance.recipe_id)
+    previous = getattr(instance, 'previous_values', None)
+    if not created:
+        if previous == current:
+            return
+        if previous is not None:
+            user, recipe = previous
+            ShoppingListItem.objects.remove_recipe((user, ), recipe)
+    ShoppingListItem.objects.add_recipe(
+        (instance.user_id, ), instance.recipe_id
+    )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, origin=None, **kwargs):
+    """Вычитание рецепта, удаленного из корзины, из списка покупок.
+
+    При удалении рецепта его вычитает ``remove_deleted_recipe``, при
+    удалении пользователя список удаляется вместе с ним.
+    """
+    if in_bulk.get() or is_cascade(sender, origin):
+        return
+    ShoppingListItem.objects.remove_recipe(
+        (instance.user_id, ), instance.recipe_id
+    )
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient(instance, **kwargs):
+    instance.previous_values = previous_values(
+        instance, 'recipe', 'ingredient', 'amount'
+    )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def change_shopping_lists(instance, created, **kwargs):
+    """Учет нового или измененного ингредиента рецепта в корзинах."""
+    if in_bulk.get():
+        return
+    amounts = {instance.ingredient_id: instance.amount}
+    previous = getattr(instance, 'previous_values', None)
+    if not created and previous is not None:
+        recipe, ingredient, amount = previous
+        if recipe == instance.recipe_id:
+            amounts[ingredient] = amounts.get(ingredient, 0) - amount
+        else:
+            ShoppingListItem.objects.change_amounts(
+                recipe, {ingredient: -amount}
+            )
+    ShoppingListItem.objects.change_amounts(instance.recipe_id, amounts)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_from_shopping_lists(sender, instance, origin=None, **kwargs):
+    """Вычитание удаленного ингредиента рецепта из корзин с рецептом."""
+    if in_bulk.get() or is_cascade(sender, origin):
+        return
+    ShoppingListItem.objects.change_amounts(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount}
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_deleted_recipe(sender, instance, origin=None, **kwargs):
+    """Вычитание удаляемого рецепта из корзин до удаления его строк.
+
+    Рецепты, удаляемые вместе с автором, учитывает
+    ``rebuild_shopping_lists``.
+    """
+    if origin is not None and is_cascade(sender, origin):
+        return
+    ShoppingListItem.objects.remove_recipe(
+        instance.favorite_shops.values_list('user', flat=True), instance
+    )
+
+
+@receiver(pre_delete, sender=User)
+def remember_shopping_list_users(instance, **kwargs):
+    """Пользователи, у которых в корзине рецепты удаляемого автора."""
+    instance.shopping_list_users = list(
+        ShoppingCart.objects.filter(recipe__author=instance)
+        .exclude(user=instance)
+        .values_list('user', flat=True)
+        .distinct()
+    )
+
+
+@receiver(post_delete, sender=User)
+def rebuild_shopping_lists(instance, **kwargs):
+    """Пересчет списков покупок без рецептов удаленного автора.
+
+    Один пересчет выполняется за постоянное число запросов, сколько бы
+    рецептов автора ни было в корзинах.
+    """
+    users = getattr(instance, 'shopping_list_users', None)
+    if users:
+        ShoppingListItem.objects.rebuild(users)
+
+
+def repair_search(using, **kwargs):
+    """Триггеры поиска SQLite, удаленные при пересоздании таблицы.
+
+    Подключается в ``RecipesConfig.ready`` к post_migrate приложения
+    recipes, чтобы выполняться один раз за migrate.
+    """
+    repair(connections[using])
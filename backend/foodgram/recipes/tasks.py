@@ -0,0 +1,39 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    """Пул фоновых потоков; создается при первой задаче в процессе."""
+    return ThreadPoolExecutor(
+        max_workers=settings.RECIPE_IMAGE_WORKERS,
+        thread_name_prefix='recipe-images',
+    )
+
+
+def run(function, *args):
+    """Выполнение задачи в потоке пула с закрытием соединений с БД."""
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('Ошибка фоновой задачи %s', function.__name__)
+    finally:
+        connections.close_all()
+
+
+def submit(function, *args):
+    """Запуск задачи в фоновом потоке после фиксации транзакции.
+
+    При ``RECIPE_IMAGE_WORKERS = 0`` задача выполняется сразу после
+    фиксации в текущем потоке.
+    """
+    if not settings.RECIPE_IMAGE_WORKERS:
+        transaction.on_commit(lambda: function(*args))
+        return
+    transaction.on_commit(lambda: get_executor().submit(run, function, *args))
@@ -0,0 +1,126 @@
+import base64
+import json
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.sampledata import create_sample_data
+from recipes.models import Favorite, ShoppingCart
+
+query_counts_key = pytest.StashKey[dict]()
+
+
+def seed_data(django_db_blocker, **options):
+    """Данные ``create_sample_data`` с пользователем для входа.
+
+    ``user`` - автор первого рецепта с рецептом в избранном и в корзине.
+    """
+    with django_db_blocker.unblock():
+        data = create_sample_data(**options)
+        user = data['recipes'][0].author
+        Favorite.objects.get_or_create(user=user, recipe=data['recipes'][1])
+        ShoppingCart.objects.get_or_create(
+            user=user, recipe=data['recipes'][1]
+        )
+        data['user'] = user
+        data['token'] = Token.objects.create(user=user)
+    return data
+
+
+@pytest.fixture(scope='session')
+def sample_volumes(django_db_setup, django_db_blocker):
+    """Тестовые данные двух объемов, общие для всех тестов запуска.
+
+    Данные создаются один раз вне транзакций тестов и до загрузки
+    справочников в память; изменения, которые делают тесты, откатываются
+    вместе с их транзакциями.
+    """
+    return {
+        'large': seed_data(
+            django_db_blocker, users=200, recipes=2000, seed=1
+        ),
+        'small': seed_data(django_db_blocker, users=20, recipes=200, seed=2),
+    }
+
+
+@pytest.fixture(scope='session')
+def sample_data(sample_volumes):
+    """Данные большого объема."""
+    return sample_volumes['large']
+
+
+@pytest.fixture(scope='session')
+def small_sample_data(sample_volumes):
+    """Данные в десять раз меньше ``sample_data`` в той же базе."""
+    return sample_volumes['small']
+
+
+@pytest.fixture(autouse=True)
+def test_settings(settings, tmp_path):
+    """Кэш в памяти, без кэширования ответов; файлы во временном каталоге."""
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    settings.RESPONSE_CACHE_TIMEOUT = 0
+    settings.MEDIA_ROOT = tmp_path
+
+
+def api_clients(data):
+    """Клиенты API анонимного пользователя и ``user`` из ``data``."""
+    authorized = APIClient()
+    authorized.credentials(HTTP_AUTHORIZATION=f'Token {data["token"].key}')
+    return {'anonymous': APIClient(), 'authorized': authorized}
+
+
+@pytest.fixture
+def clients(sample_data):
+    """Клиенты API анонимного и авторизованного пользователя."""
+    return api_clients(sample_data)
+
+
+@pytest.fixture
+def small_clients(small_sample_data):
+    """Клиенты API для данных ``small_sample_data``."""
+    return api_clients(small_sample_data)
+
+
+@pytest.fixture
+def image_payload():
+    """Картинка PNG в base64 с заголовком, как ее присылает фронтенд."""
+    buffer = BytesIO()
+    Image.new('RGB', (800, 600), 'orange').save(buffer, 'PNG')
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{data}'
+
+
+@pytest.fixture(scope='session')
+def query_counts(pytestconfig):
+    """Измеренное число запросов: {проверка: {пользователь: число}}."""
+    return pytestconfig.stash.setdefault(query_counts_key, {})
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """Число запросов каждого маршрута в отчете и в файле JSON.
+
+    Путь к файлу задает переменная окружения ``QUERY_COUNTS_FILE``;
+    файл с сортированными ключами удобно сравнивать между коммитами.
+    """
+    counts = config.stash.get(query_counts_key, None)
+    if not counts:
+        return
+    terminalreporter.section('query counts')
+    for name, roles in sorted(counts.items()):
+        terminalreporter.write_line('{}: {}'.format(name, ', '.join(
+            f'{role} {count}' for role, count in sorted(roles.items())
+        )))
+    path = os.getenv('QUERY_COUNTS_FILE')
+    if path:
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(counts, file, indent=2, sort_keys=True)
+            file.write('\n')
@@ -0,0 +1,102 @@
+import importlib
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.test import AsyncClient
+from django.urls import clear_url_caches, resolve
+
+import api.urls
+import foodgram.urls
+from recipes.models import Recipe
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def set_async_views(settings):
+    """Пересборка маршрутов API с асинхронными представлениями и без них."""
+    enabled = settings.ASYNC_VIEWS
+
+    def set_async_views(value):
+        settings.ASYNC_VIEWS = value
+        importlib.reload(api.urls)
+        importlib.reload(foodgram.urls)
+        clear_url_caches()
+
+    yield set_async_views
+    set_async_views(enabled)
+
+
+@pytest.fixture
+def get_both(clients, sample_data, set_async_views):
+    """Ответы синхронного и асинхронного представления на один GET."""
+    headers = {
+        'anonymous': {},
+        'authorized': {
+            'Authorization': f'Token {sample_data["token"].key}',
+        },
+    }
+
+    def get_both(path, role='anonymous'):
+        set_async_views(False)
+        sync_response = clients[role].get(path)
+        set_async_views(True)
+        assert iscoroutinefunction(resolve(path.split('?')[0]).func)
+        async_response = async_to_sync(AsyncClient().get)(
+            path, headers=headers[role]
+        )
+        return sync_response, async_response
+
+    return get_both
+
+
+@pytest.mark.parametrize('path, role', (
+    ('/api/recipes/', 'anonymous'),
+    ('/api/recipes/?page=3&limit=10', 'anonymous'),
+    ('/api/recipes/?limit=5&cursor=', 'anonymous'),
+    ('/api/recipes/?is_favorited=1', 'authorized'),
+    ('/api/recipes/?is_in_shopping_cart=1', 'authorized'),
+    ('/api/recipes/{recipe}/', 'anonymous'),
+    ('/api/recipes/{recipe}/', 'authorized'),
+    ('/api/ingredients/?name=с', 'anonymous'),
+    ('/api/ingredients/{ingredient}/', 'anonymous'),
+    ('/api/tags/', 'anonymous'),
+    ('/api/tags/{tag}/', 'anonymous'),
+    ('/api/users/subscriptions/?limit=3&recipes_limit=2', 'authorized'),
+))
+def test_async_views_match_sync(get_both, sample_data, path, role):
+    path = path.format(
+        recipe=sample_data['recipes'][1].id,
+        ingredient=sample_data['ingredients'][0].id,
+        tag=sample_data['tags'][0].id,
+    )
+    sync_response, async_response = get_both(path, role)
+    assert sync_response.status_code == 200
+    assert async_response.status_code == 200
+    assert async_response.json() == sync_response.json()
+    assert async_response.get('ETag') == sync_response.get('ETag')
+
+
+@pytest.mark.parametrize('path', (
+    '/api/recipes/999999/',
+    '/api/recipes/abc/',
+    '/api/recipes/?page=9999',
+    '/api/ingredients/999999/',
+    '/api/tags/999999/',
+))
+def test_async_views_missing_object(get_both, path):
+    sync_response, async_response = get_both(path)
+    assert sync_response.status_code == 404
+    assert async_response.status_code == 404
+    assert async_response.json() == sync_response.json()
+
+
+def test_async_views_keep_sync_writes(sample_data, set_async_views):
+    set_async_views(True)
+    recipe = Recipe.objects.exclude(favorite__user=sample_data['user'])[0]
+    response = async_to_sync(AsyncClient().post)(
+        f'/api/recipes/{recipe.id}/favorite/',
+        headers={'Authorization': f'Token {sample_data["token"].key}'},
+    )
+    assert response.status_code == 201
+    assert response.json()['id'] == recipe.id
@@ -0,0 +1,139 @@
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from api import catalog
+from api.cache import RECIPES, get_version
+from api.catalog import ingredient_catalog
+from recipes.management.commands import load_ingredients
+from recipes.models import Ingredient
+
+pytestmark = pytest.mark.django_db
+
+
+def test_catalog_version_read_once_per_validation(clients, sample_data,
+                                                  monkeypatch):
+    calls = []
+    get_version = catalog.get_version
+
+    def counted_get_version(name):
+        calls.append(name)
+        return get_version(name)
+
+    monkeypatch.setattr(catalog, 'get_version', counted_get_version)
+    response = clients['authorized'].patch(
+        f'/api/recipes/{sample_data["recipes"][0].id}/',
+        {
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 10}
+                for ingredient in sample_data['ingredients'][:20]
+            ],
+            'tags': [tag.id for tag in sample_data['tags'][:3]],
+            'cooking_time': 10,
+        },
+        format='json'
+    )
+    assert response.status_code == 200
+    assert len(calls) == 2
+
+
+def test_load_ingredients_refreshes_catalog(
+    tmp_path, django_capture_on_commit_callbacks
+):
+    ingredient_catalog.load()
+    recipes_version = get_version(RECIPES)
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('Кабачок молодой,г\n', encoding='utf-8')
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command('load_ingredients', path)
+    created = Ingredient.objects.get(name='Кабачок молодой')
+    assert ingredient_catalog.get(created.pk) == created
+    assert get_version(RECIPES) != recipes_version
+
+
+@pytest.mark.skipif(
+    connection.vendor != 'postgresql', reason='COPY есть только в PostgreSQL.'
+)
+def test_load_ingredients_copies_on_postgresql(tmp_path, monkeypatch):
+    copied = []
+    copy = load_ingredients.Command.copy
+
+    def recorded_copy(self, rows):
+        copied.extend(rows)
+        copy(self, rows)
+
+    monkeypatch.setattr(load_ingredients.Command, 'copy', recorded_copy)
+    path = tmp_path / 'ingredients.csv'
+    path.write_text(
+        'Кабачок молодой,г\n"Перец ""чили"", молотый",г\n', encoding='utf-8'
+    )
+    call_command('load_ingredients', path)
+    assert len(copied) == 2
+    assert Ingredient.objects.filter(
+        name='Перец "чили", молотый', measurement_unit='г'
+    ).exists()
+
+
+def test_load_ingredients_reads_path_from_settings(tmp_path, settings):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(
+        '[{"name": "Кабачок молодой", "measurement_unit": "г"}]',
+        encoding='utf-8'
+    )
+    settings.INGREDIENTS_FILE = str(path)
+    call_command('load_ingredients')
+    assert Ingredient.objects.filter(name='Кабачок молодой').exists()
+
+
+def test_load_ingredients_requires_path(settings):
+    settings.INGREDIENTS_FILE = ''
+    with pytest.raises(CommandError, match='INGREDIENTS_FILE'):
+        call_command('load_ingredients')
+
+
+@pytest.mark.parametrize('batch_size', ('0', '-5', 'много'))
+def test_load_ingredients_rejects_bad_batch_size(tmp_path, batch_size):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('Кабачок молодой,г\n', encoding='utf-8')
+    with pytest.raises(CommandError, match='batch-size'):
+        call_command('load_ingredients', path, '--batch-size', batch_size)
+
+
+@pytest.fixture
+def sorrel(django_capture_on_commit_callbacks):
+    """Ингредиенты, которые начинаются со слова «щавель» в разном регистре
+    или содержат его в середине названия."""
+    with django_capture_on_commit_callbacks(execute=True):
+        for name in ('Суп щавелевый', 'ЩАВЕЛЬ конский', 'Щавель кислый'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+
+def search_ingredients(clients, **params):
+    response = clients['anonymous'].get('/api/ingredients/', params)
+    assert response.status_code == 200
+    return [ingredient['name'] for ingredient in response.json()]
+
+
+def test_ingredient_search_ranks_prefix_above_substring(clients, sorrel):
+    assert search_ingredients(clients, name='щАВ') == [
+        'Щавель кислый', 'ЩАВЕЛЬ конский', 'Суп щавелевый'
+    ]
+
+
+def test_ingredient_search_ignores_case(clients, sorrel):
+    assert search_ingredients(clients, name='ЩАВЕЛЬ К') == search_ingredients(
+        clients, name='щавель к'
+    ) == ['Щавель кислый', 'ЩАВЕЛЬ конский']
+
+
+@pytest.mark.parametrize('params, count', (
+    ({}, 100),
+    ({'limit': 500}, 100),
+    ({'limit': 5}, 5),
+    ({'limit': 'abc'}, 100),
+    ({'name': 'щав', 'limit': 2}, 2),
+))
+def test_ingredient_search_limit(clients, sample_data, sorrel, params,
+                                 count):
+    assert len(sample_data['ingredients']) > 100
+    assert len(search_ingredients(clients, **params)) == count
@@ -0,0 +1,31 @@
+import pytest
+from django.utils.http import parse_http_date
+
+from api.cache import TAGS, bump_version, get_version
+
+pytestmark = pytest.mark.django_db
+
+
+def test_not_modified_only_by_etag(clients):
+    client = clients['anonymous']
+    first = client.get('/api/tags/')
+    assert client.get(
+        '/api/tags/', HTTP_IF_NONE_MATCH=first['ETag']
+    ).status_code == 304
+    assert client.get(
+        '/api/tags/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+    ).status_code == 200
+
+
+def test_change_in_same_second_changes_etag(clients):
+    client = clients['anonymous']
+    first = client.get('/api/tags/')
+    bump_version(TAGS)
+    second = client.get('/api/tags/', HTTP_IF_NONE_MATCH=first['ETag'])
+    assert second.status_code == 200
+    assert second['ETag'] != first['ETag']
+
+
+def test_last_modified_is_not_before_change(clients):
+    response = clients['anonymous'].get('/api/tags/')
+    assert parse_http_date(response['Last-Modified']) >= get_version(TAGS)
@@ -0,0 +1,65 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.counters import recount
+from recipes.models import Favorite, Recipe, ShoppingListItem
+from users.models import Follow, User
+
+pytestmark = pytest.mark.django_db
+
+
+def assert_no_drift():
+    assert set(recount(check=True).values()) == {0}
+
+
+def test_moved_rows_keep_counters(sample_data):
+    recipe = Recipe.objects.exclude(author=sample_data['user']).first()
+    recipe.author = sample_data['user']
+    recipe.save()
+    follow = Follow.objects.exclude(author=sample_data['user']).first()
+    follow.author = sample_data['user']
+    follow.save()
+    favorite = Favorite.objects.exclude(recipe=recipe).first()
+    favorite.recipe = recipe
+    favorite.save()
+    assert_no_drift()
+
+
+def test_partial_save_skips_previous_lookup(sample_data,
+                                            django_assert_num_queries):
+    recipe = Recipe.objects.get(pk=sample_data['recipes'][0].pk)
+    recipe.name = 'Новое название'
+    with django_assert_num_queries(1):
+        recipe.save(update_fields=('name', ))
+
+
+@pytest.mark.parametrize('route', ('favorite', 'shopping_cart'))
+def test_many_routes_keep_counters(clients, sample_data, route):
+    ids = [recipe.id for recipe in sample_data['recipes'][1:6]]
+    client = clients['authorized']
+    for method in ('post', 'delete', 'post'):
+        response = getattr(client, method)(
+            f'/api/recipes/{route}/', {'recipes': ids}, format='json'
+        )
+        assert response.status_code == 200
+    assert_no_drift()
+    assert ShoppingListItem.objects.mismatches() == {}
+
+
+def test_deleted_user_and_recipe_keep_counters(sample_data):
+    recipe = Recipe.objects.filter(favorites_count__gt=1).first()
+    user = User.objects.filter(
+        recipes_count__gt=5, favorites__isnull=False, follower__isnull=False
+    ).exclude(pk=recipe.author_id).first()
+    with CaptureQueriesContext(connection) as queries:
+        recipe.delete()
+        user.delete()
+    counter_updates = [
+        query for query in queries.captured_queries
+        if query['sql'].startswith('UPDATE') and '_count' in query['sql']
+    ]
+    # Автор удаленного рецепта и по одному обновлению на избранное
+    # и подписки удаленного пользователя.
+    assert len(counter_updates) == 3
+    assert_no_drift()
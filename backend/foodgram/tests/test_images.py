@@ -0,0 +1,121 @@
+import pytest
+from django.core.management import call_command
+
+from api.cache import RECIPES, get_version
+from recipes import images
+from recipes.images import process_upload
+from recipes.models import Recipe
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def inline_worker(settings):
+    """Обработка картинок сразу после фиксации, без пула потоков."""
+    settings.RECIPE_IMAGE_WORKERS = 0
+
+
+def recipe_payload(sample_data, image):
+    return {
+        'name': 'Омлет',
+        'text': 'Взбить и пожарить.',
+        'cooking_time': 10,
+        'image': image,
+        'tags': [sample_data['tags'][0].id],
+        'ingredients': [
+            {'id': sample_data['ingredients'][0].id, 'amount': 3}
+        ],
+    }
+
+
+def assert_processed(recipe):
+    recipe.refresh_from_db()
+    assert recipe.image_status == Recipe.IMAGE_READY
+    assert recipe.has_image_variants()
+    assert recipe.image.storage.exists(recipe.image.name)
+    assert not recipe.image_upload
+
+
+def test_upload_is_stored_and_processed(clients, sample_data, image_payload,
+                                        django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = clients['authorized'].post(
+            '/api/recipes/', recipe_payload(sample_data, image_payload),
+            format='json'
+        )
+    assert response.status_code == 201
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    upload = Recipe.objects.filter(pk=recipe.pk).values_list(
+        'image_upload', flat=True
+    )
+    assert_processed(recipe)
+    assert not upload.get()
+
+
+def test_lost_jobs_are_redriven(clients, sample_data, image_payload):
+    response = clients['authorized'].post(
+        '/api/recipes/', recipe_payload(sample_data, image_payload),
+        format='json'
+    )
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    assert recipe.image_status == Recipe.IMAGE_PROCESSING
+    upload = recipe.image_upload.name
+    assert recipe.image_upload.storage.exists(upload)
+    call_command('process_image_uploads')
+    assert_processed(recipe)
+    assert not recipe.image_upload.storage.exists(upload)
+
+
+def test_worker_keeps_other_fields_and_bumps_version(
+    clients, sample_data, image_payload, django_capture_on_commit_callbacks
+):
+    response = clients['authorized'].post(
+        '/api/recipes/', recipe_payload(sample_data, image_payload),
+        format='json'
+    )
+    recipe_id = response.data['id']
+    Recipe.objects.filter(pk=recipe_id).update(name='Омлет с сыром')
+    version = get_version(RECIPES)
+    with django_capture_on_commit_callbacks(execute=True):
+        process_upload(recipe_id)
+    recipe = Recipe.objects.get(pk=recipe_id)
+    assert recipe.name == 'Омлет с сыром'
+    assert_processed(recipe)
+    assert get_version(RECIPES) != version
+
+
+def test_replaced_upload_is_not_applied(clients, sample_data, image_payload,
+                                        monkeypatch):
+    response = clients['authorized'].post(
+        '/api/recipes/', recipe_payload(sample_data, image_payload),
+        format='json'
+    )
+    recipe_id = response.data['id']
+    generate_variants = images.generate_variants
+
+    def replaced_during_processing(image):
+        Recipe.objects.filter(pk=recipe_id).update(
+            image_upload='recipes/uploads/newer.b64'
+        )
+        return generate_variants(image)
+
+    monkeypatch.setattr(
+        images, 'generate_variants', replaced_during_processing
+    )
+    process_upload(recipe_id)
+    recipe = Recipe.objects.get(pk=recipe_id)
+    assert recipe.image_status == Recipe.IMAGE_PROCESSING
+    assert recipe.image_upload.name == 'recipes/uploads/newer.b64'
+    assert not recipe.image
+
+
+def test_broken_upload_fails(clients, sample_data):
+    response = clients['authorized'].post(
+        '/api/recipes/',
+        recipe_payload(sample_data, 'data:image/png;base64,bm90IGFuIGltYWdl'),
+        format='json'
+    )
+    process_upload(response.data['id'])
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    assert recipe.image_status == Recipe.IMAGE_FAILED
+    assert not recipe.image_upload
@@ -0,0 +1,40 @@
+import pytest
+
+pytestmark = pytest.mark.django_db
+
+
+def ids(response):
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def test_cursor_pages_by_pub_date(clients):
+    client = clients['anonymous']
+    first = client.get('/api/recipes/?limit=5&cursor=')
+    assert 'count' not in first.data
+    second = client.get(first.data['next'])
+    assert not set(ids(first)) & set(ids(second))
+    assert ids(first) + ids(second) == ids(
+        client.get('/api/recipes/?limit=10')
+    )
+
+
+@pytest.mark.parametrize('query', (
+    'search={word}',
+    'ingredients={ingredients}&match=any',
+))
+def test_cursor_keeps_ranking(clients, sample_data, query):
+    recipe = sample_data['recipes'][0]
+    query = query.format(
+        word=recipe.name.split()[0],
+        ingredients=','.join(
+            str(pk) for pk in recipe.recipe_ingredients.values_list(
+                'ingredient_id', flat=True
+            )
+        ),
+    )
+    client = clients['anonymous']
+    ranked = client.get(f'/api/recipes/?limit=10&{query}')
+    with_cursor = client.get(f'/api/recipes/?limit=10&cursor=&{query}')
+    assert with_cursor.status_code == 200
+    assert with_cursor.data['count'] == ranked.data['count']
+    assert ids(with_cursor) == ids(ranked)
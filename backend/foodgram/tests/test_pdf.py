@@ -0,0 +1,40 @@
+from io import BytesIO
+
+from pypdf import PdfReader
+
+from api.pdf import PdfDocument
+from api.renderers import PdfRenderer
+
+
+def read(chunks):
+    return PdfReader(BytesIO(b''.join(chunks)), strict=True)
+
+
+def test_document_opens_with_cyrillic_text():
+    document = PdfDocument()
+    data = [
+        document.header(),
+        document.text_page(['Мука пшеничная - 500 г', 'Ёжик'], 12, 16),
+        document.trailer(),
+    ]
+    reader = read(data)
+    assert len(reader.pages) == 1
+    text = reader.pages[0].extract_text()
+    assert 'Мука пшеничная - 500 г' in text
+    assert 'Ёжик' in text
+
+
+def test_renderer_splits_pages_and_escapes_text():
+    rows = [
+        (f'Соль (морская) \\ {number}', 'г', number)
+        for number in range(PdfRenderer.lines_per_page * 2 + 1)
+    ]
+    reader = read(PdfRenderer().stream(rows))
+    assert len(reader.pages) == 3
+    assert 'Соль (морская) \\ 0 - 0 г' in reader.pages[0].extract_text()
+    assert 'Соль (морская) \\ 100 - 100 г' in reader.pages[2].extract_text()
+
+
+def test_renderer_empty_list_is_valid_document():
+    reader = read(PdfRenderer().stream([]))
+    assert len(reader.pages) == 1
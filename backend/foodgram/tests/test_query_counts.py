@@ -0,0 +1,623 @@
+import pytest
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from djoser.utils import encode_uid
+
+from api.catalog import tag_catalog
+from api.indexes import ingredient_index, recipe_ingredient_index
+from api.sampledata import SAMPLE_PASSWORD
+from recipes.models import (Favorite, Recipe, ShoppingCart,
+                            ShoppingListItem)
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+# Размеры страницы: число запросов от них не зависит, как и от объема
+# данных: каждая проверка выполняется на small_sample_data и sample_data.
+LIMITS = (6, 30)
+# Запросы, которые создает транзакция теста, а не маршрут.
+SAVEPOINT_PREFIXES = (
+    'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT'
+)
+NEW_PASSWORD = 'Nov0e-parol-dlya-proverki'
+
+# Название проверки: маршрут, метод, наибольшее число запросов
+# (анонимный, авторизованный) и функция, которая возвращает путь,
+# тело запроса и ожидаемый статус ответа. None - проверка не выполняется
+# для этого пользователя.
+CASES = {}
+
+
+def case(name, route, method, anonymous=None, authorized=None):
+    def register(build):
+        CASES[name] = (route, method, (anonymous, authorized), build)
+        return build
+    return register
+
+
+def other_user(data):
+    """Пользователь без входа, не ``user``."""
+    return next(user for user in data['users'] if user != data['user'])
+
+
+def own_recipe(data):
+    return Recipe.objects.filter(author=data['user']).first()
+
+
+def ingredient_ids(recipe):
+    return {item.ingredient_id for item in recipe.recipe_ingredients.all()}
+
+
+def fresh_recipes(data, limit):
+    """Рецепты, которых нет в избранном и в корзине ``user``.
+
+    У первого рецепта часть ингредиентов уже есть в списке покупок
+    ``user``, а часть нет: добавление и удаление рецептов корзины и
+    создает, и меняет, и удаляет строки списка при любом объеме данных.
+    """
+    listed = set(ShoppingListItem.objects.filter(
+        user=data['user']
+    ).values_list('ingredient', flat=True))
+    recipes = Recipe.objects.exclude(favorite__user=data['user']).exclude(
+        favorite_shops__user=data['user']
+    ).prefetch_related('recipe_ingredients')
+    first = next(
+        recipe for recipe in recipes.iterator(chunk_size=100)
+        if listed & ingredient_ids(recipe) and ingredient_ids(recipe) - listed
+    )
+    return [first.id, *recipes.exclude(pk=first.pk).values_list(
+        'id', flat=True
+    )[:limit - 1]]
+
+
+def with_buyer(data, recipe):
+    """``recipe`` в избранном и корзине другого пользователя.
+
+    В корзине покупателя еще один рецепт с частью тех же ингредиентов,
+    поэтому изменение и удаление ``recipe`` и меняет, и удаляет строки
+    его списка покупок при любом объеме данных. Возвращает этот рецепт.
+    """
+    buyer = other_user(data)
+    ingredients = ingredient_ids(recipe)
+    partner = next(
+        other for other in Recipe.objects.filter(
+            recipe_ingredients__ingredient__in=ingredients
+        ).exclude(pk=recipe.pk).distinct().prefetch_related(
+            'recipe_ingredients'
+        ).iterator(chunk_size=100)
+        if not ingredients <= ingredient_ids(other)
+    )
+    ShoppingCart.objects.filter(user=buyer).delete()
+    ShoppingCart.objects.create(user=buyer, recipe=recipe)
+    ShoppingCart.objects.create(user=buyer, recipe=partner)
+    Favorite.objects.get_or_create(user=buyer, recipe=recipe)
+    return partner
+
+
+def added(model, data, limit):
+    """Рецепты, добавленные в избранное или корзину ``user``."""
+    recipes = fresh_recipes(data, limit)
+    for recipe_id in recipes:
+        model.objects.create(user=data['user'], recipe_id=recipe_id)
+    return recipes
+
+
+def deleted_user(data, recipes=5):
+    """``user`` с ``recipes`` рецептами перед удалением.
+
+    Django удаляет связанные строки пачками по 100, и число запросов
+    зависит от количества строк самого пользователя, а не от объема
+    данных; поэтому у него в обоих объемах одинаково немного рецептов.
+    """
+    extra = list(Recipe.objects.filter(author=data['user']).values_list(
+        'pk', flat=True
+    )[recipes:])
+    Recipe.objects.filter(pk__in=extra).delete()
+    return data['user']
+
+
+def recipe_data(data, limit, image_payload):
+    return {
+        'name': 'Проверка',
+        'text': 'Проверка',
+        'cooking_time': 10,
+        'tags': [tag.id for tag in data['tags'][:2]],
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 10}
+            for ingredient in data['ingredients'][:limit]
+        ],
+        'image': image_payload,
+    }
+
+
+def user_data(data):
+    return {
+        'email': 'new-user@example.org',
+        'username': 'new-user',
+        'first_name': 'Имя',
+        'last_name': 'Фамилия',
+    }
+
+
+def confirmation(user):
+    """uid и токен из письма со ссылкой подтверждения."""
+    return {
+        'uid': encode_uid(user.pk),
+        'token': default_token_generator.make_token(user),
+    }
+
+
+@case('api-root', 'api-root', 'get', 0, 1)
+def api_root(data, limit, image):
+    return '/api/', None, 200
+
+
+@case('recipes-list', 'recipes-list', 'get', 4, 5)
+def recipes_list(data, limit, image):
+    return f'/api/recipes/?limit={limit}', None, 200
+
+
+@case('recipes-list-cursor', 'recipes-list', 'get', 3, 4)
+def recipes_list_cursor(data, limit, image):
+    return f'/api/recipes/?limit={limit}&cursor=', None, 200
+
+
+@case('recipes-list-tags', 'recipes-list', 'get', 4, 5)
+def recipes_list_tags(data, limit, image):
+    first, second = data['tags'][:2]
+    return (
+        f'/api/recipes/?limit={limit}&tags={first.slug}&tags={second.slug}',
+        None, 200
+    )
+
+
+@case('recipes-list-author', 'recipes-list', 'get', 5, 6)
+def recipes_list_author(data, limit, image):
+    return (
+        f'/api/recipes/?limit={limit}&author={data["user"].id}', None, 200
+    )
+
+
+@case('recipes-list-search', 'recipes-list', 'get', 4, 5)
+def recipes_list_search(data, limit, image):
+    word = data['recipes'][0].name.split()[0]
+    return f'/api/recipes/?limit={limit}&search={word}', None, 200
+
+
+@case('recipes-list-ingredients', 'recipes-list', 'get', 4, 5)
+def recipes_list_ingredients(data, limit, image):
+    pantry = ','.join(
+        str(pk) for pk in data['recipes'][0].recipe_ingredients.values_list(
+            'ingredient_id', flat=True
+        )
+    )
+    return (
+        f'/api/recipes/?limit={limit}&match=any&ingredients={pantry}'
+        f'&exclude_ingredients={data["ingredients"][-1].id}', None, 200
+    )
+
+
+@case('recipes-list-favorited', 'recipes-list', 'get', authorized=5)
+def recipes_list_favorited(data, limit, image):
+    return f'/api/recipes/?limit={limit}&is_favorited=1', None, 200
+
+
+@case('recipes-list-in-shopping-cart', 'recipes-list', 'get', authorized=5)
+def recipes_list_in_shopping_cart(data, limit, image):
+    return f'/api/recipes/?limit={limit}&is_in_shopping_cart=1', None, 200
+
+
+@case('recipes-create', 'recipes-list', 'post', authorized=12)
+def recipes_create(data, limit, image):
+    return '/api/recipes/', recipe_data(data, limit, image), 201
+
+
+@case('recipes-detail', 'recipes-detail', 'get', 3, 4)
+def recipes_detail(data, limit, image):
+    return f'/api/recipes/{data["recipes"][0].id}/', None, 200
+
+
+@case('recipes-update', 'recipes-detail', 'put', authorized=1)
+def recipes_update(data, limit, image):
+    # Рецепт меняется только частично, PUT не поддерживается.
+    return (
+        f'/api/recipes/{own_recipe(data).id}/',
+        recipe_data(data, limit, image), 405
+    )
+
+
+@case('recipes-partial-update', 'recipes-detail', 'patch', authorized=19)
+def recipes_partial_update(data, limit, image):
+    # Один общий с рецептом покупателя ингредиент остается с новым
+    # количеством, остальные заменяются новыми; к тегам добавляется один.
+    recipe = own_recipe(data)
+    partner = ingredient_ids(with_buyer(data, recipe))
+    current = ingredient_ids(recipe)
+    kept = recipe.recipe_ingredients.filter(
+        ingredient__in=partner
+    ).first()
+    tags = set(recipe.tags.values_list('id', flat=True))
+    return (
+        f'/api/recipes/{recipe.id}/',
+        {
+            **recipe_data(data, limit, image),
+            'ingredients': [
+                {'id': kept.ingredient_id, 'amount': kept.amount + 1},
+                *(
+                    {'id': ingredient.id, 'amount': 10}
+                    for ingredient in data['ingredients']
+                    if ingredient.id not in current | partner
+                )
+            ][:limit],
+            'tags': [
+                *tags,
+                next(tag.id for tag in data['tags'] if tag.id not in tags)
+            ],
+        },
+        200
+    )
+
+
+@case('recipes-delete', 'recipes-detail', 'delete', authorized=18)
+def recipes_delete(data, limit, image):
+    recipe = own_recipe(data)
+    with_buyer(data, recipe)
+    return f'/api/recipes/{recipe.id}/', None, 204
+
+
+@case('recipes-favorite-add', 'recipes-favorite', 'post', authorized=6)
+def recipes_favorite_add(data, limit, image):
+    recipe_id = fresh_recipes(data, 1)[0]
+    return f'/api/recipes/{recipe_id}/favorite/', None, 201
+
+
+@case('recipes-favorite-remove', 'recipes-favorite', 'delete',
+      authorized=5)
+def recipes_favorite_remove(data, limit, image):
+    return f'/api/recipes/{data["recipes"][1].id}/favorite/', None, 204
+
+
+@case('recipes-shopping-cart-add', 'recipes-shopping-cart', 'post',
+      authorized=9)
+def recipes_shopping_cart_add(data, limit, image):
+    recipe_id = fresh_recipes(data, 1)[0]
+    return f'/api/recipes/{recipe_id}/shopping_cart/', None, 201
+
+
+@case('recipes-shopping-cart-remove', 'recipes-shopping-cart', 'delete',
+      authorized=8)
+def recipes_shopping_cart_remove(data, limit, image):
+    return f'/api/recipes/{data["recipes"][1].id}/shopping_cart/', None, 204
+
+
+@case('recipes-favorite-add-many', 'recipes-favorite-many', 'post',
+      authorized=5)
+def recipes_favorite_add_many(data, limit, image):
+    return (
+        '/api/recipes/favorite/',
+        {'recipes': fresh_recipes(data, limit)}, 200
+    )
+
+
+@case('recipes-favorite-remove-many', 'recipes-favorite-many', 'delete',
+      authorized=6)
+def recipes_favorite_remove_many(data, limit, image):
+    return (
+        '/api/recipes/favorite/',
+        {'recipes': added(Favorite, data, limit)}, 200
+    )
+
+
+@case('recipes-shopping-cart-add-many', 'recipes-shopping-cart-many',
+      'post', authorized=8)
+def recipes_shopping_cart_add_many(data, limit, image):
+    return (
+        '/api/recipes/shopping_cart/',
+        {'recipes': fresh_recipes(data, limit)}, 200
+    )
+
+
+@case('recipes-shopping-cart-remove-many', 'recipes-shopping-cart-many',
+      'delete', authorized=9)
+def recipes_shopping_cart_remove_many(data, limit, image):
+    return (
+        '/api/recipes/shopping_cart/',
+        {'recipes': added(ShoppingCart, data, limit)}, 200
+    )
+
+
+@case('recipes-download-shopping-cart', 'recipes-download-shopping-cart',
+      'get', authorized=2)
+def recipes_download_shopping_cart(data, limit, image):
+    return '/api/recipes/download_shopping_cart/', None, 200
+
+
+@case('tags-list', 'tags-list', 'get', 0, 1)
+def tags_list(data, limit, image):
+    return '/api/tags/', None, 200
+
+
+@case('tags-detail', 'tags-detail', 'get', 0, 1)
+def tags_detail(data, limit, image):
+    return f'/api/tags/{data["tags"][0].id}/', None, 200
+
+
+@case('ingredients-list', 'ingredients-list', 'get', 0, 1)
+def ingredients_list(data, limit, image):
+    name = data['ingredients'][0].name[:4]
+    return f'/api/ingredients/?name={name}', None, 200
+
+
+@case('ingredients-detail', 'ingredients-detail', 'get', 0, 1)
+def ingredients_detail(data, limit, image):
+    return f'/api/ingredients/{data["ingredients"][0].id}/', None, 200
+
+
+@case('users-list', 'users-list', 'get', 2, 3)
+def users_list(data, limit, image):
+    return f'/api/users/?limit={limit}', None, 200
+
+
+@case('users-create', 'users-list', 'post', anonymous=3)
+def users_create(data, limit, image):
+    return (
+        '/api/users/',
+        {**user_data(data), 'password': NEW_PASSWORD}, 201
+    )
+
+
+@case('users-detail', 'users-detail', 'get', authorized=2)
+def users_detail(data, limit, image):
+    return f'/api/users/{data["recipes"][0].author_id}/', None, 200
+
+
+@case('users-update', 'users-detail', 'put', authorized=5)
+def users_update(data, limit, image):
+    return f'/api/users/{data["user"].id}/', user_data(data), 200
+
+
+@case('users-partial-update', 'users-detail', 'patch', authorized=4)
+def users_partial_update(data, limit, image):
+    return (
+        f'/api/users/{data["user"].id}/', {'first_name': 'Новое имя'}, 200
+    )
+
+
+@case('users-delete', 'users-detail', 'delete', authorized=29)
+def users_delete(data, limit, image):
+    return (
+        f'/api/users/{deleted_user(data).id}/',
+        {'current_password': SAMPLE_PASSWORD}, 204
+    )
+
+
+@case('users-me', 'users-me', 'get', authorized=1)
+def users_me(data, limit, image):
+    return '/api/users/me/', None, 200
+
+
+@case('users-me-update', 'users-me', 'put', authorized=4)
+def users_me_update(data, limit, image):
+    return '/api/users/me/', user_data(data), 200
+
+
+@case('users-me-partial-update', 'users-me', 'patch', authorized=3)
+def users_me_partial_update(data, limit, image):
+    return '/api/users/me/', {'first_name': 'Новое имя'}, 200
+
+
+@case('users-me-delete', 'users-me', 'delete', authorized=28)
+def users_me_delete(data, limit, image):
+    deleted_user(data)
+    return '/api/users/me/', {'current_password': SAMPLE_PASSWORD}, 204
+
+
+@case('users-subscriptions', 'users-subscriptions', 'get', authorized=4)
+def users_subscriptions(data, limit, image):
+    return (
+        f'/api/users/subscriptions/?limit={limit}&recipes_limit={limit}',
+        None, 200
+    )
+
+
+@case('users-subscribe', 'users-subscribe', 'post', authorized=5)
+def users_subscribe(data, limit, image):
+    author = User.objects.exclude(following__user=data['user']).exclude(
+        pk=data['user'].pk
+    ).filter(recipes_count__gt=0).first()
+    return f'/api/users/{author.id}/subscribe/', None, 201
+
+
+@case('users-unsubscribe', 'users-subscribe', 'delete', authorized=5)
+def users_unsubscribe(data, limit, image):
+    author = User.objects.filter(following__user=data['user']).first()
+    return f'/api/users/{author.id}/subscribe/', None, 204
+
+
+@case('users-set-password', 'users-set-password', 'post', authorized=3)
+def users_set_password(data, limit, image):
+    return (
+        '/api/users/set_password/',
+        {'current_password': SAMPLE_PASSWORD, 'new_password': NEW_PASSWORD},
+        204
+    )
+
+
+@case('users-set-username', 'users-set-username', 'post', authorized=4)
+def users_set_username(data, limit, image):
+    return (
+        '/api/users/set_email/',
+        {
+            'current_password': SAMPLE_PASSWORD,
+            'new_email': 'new-email@example.org',
+        },
+        204
+    )
+
+
+@case('users-activation', 'users-activation', 'post', anonymous=3)
+def users_activation(data, limit, image):
+    user = other_user(data)
+    User.objects.filter(pk=user.pk).update(is_active=False)
+    user.refresh_from_db()
+    return '/api/users/activation/', confirmation(user), 204
+
+
+@case('users-resend-activation', 'users-resend-activation', 'post',
+      anonymous=1)
+def users_resend_activation(data, limit, image):
+    # Письма активации отключены, djoser отвечает 400.
+    return (
+        '/api/users/resend_activation/',
+        {'email': other_user(data).email}, 400
+    )
+
+
+@case('users-reset-password', 'users-reset-password', 'post',
+      anonymous=1)
+def users_reset_password(data, limit, image):
+    return (
+        '/api/users/reset_password/', {'email': other_user(data).email}, 204
+    )
+
+
+@case('users-reset-password-confirm', 'users-reset-password-confirm',
+      'post', anonymous=3)
+def users_reset_password_confirm(data, limit, image):
+    return (
+        '/api/users/reset_password_confirm/',
+        {**confirmation(other_user(data)), 'new_password': NEW_PASSWORD},
+        204
+    )
+
+
+@case('users-reset-username', 'users-reset-username', 'post',
+      anonymous=1)
+def users_reset_username(data, limit, image):
+    return '/api/users/reset_email/', {'email': other_user(data).email}, 204
+
+
+@case('users-reset-username-confirm', 'users-reset-username-confirm',
+      'post', anonymous=4)
+def users_reset_username_confirm(data, limit, image):
+    return (
+        '/api/users/reset_email_confirm/',
+        {
+            **confirmation(other_user(data)),
+            'new_email': 'new-email@example.org',
+        },
+        204
+    )
+
+
+@case('token-login', 'login', 'post', anonymous=3)
+def token_login(data, limit, image):
+    return (
+        '/api/auth/token/login/',
+        {'email': data['user'].email, 'password': SAMPLE_PASSWORD}, 200
+    )
+
+
+@case('token-logout', 'logout', 'post', authorized=2)
+def token_logout(data, limit, image):
+    return '/api/auth/token/logout/', None, 204
+
+
+def url_patterns(resolver, prefix=''):
+    """Маршруты и их шаблоны в порядке, в котором их проверяет Django."""
+    for pattern in resolver.url_patterns:
+        path = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from url_patterns(pattern, path)
+        else:
+            yield path, pattern
+
+
+def registered_routes():
+    """Пары (маршрут, метод) API, до которых доходят запросы.
+
+    Маршрут с тем же шаблоном, что и зарегистрированный раньше (djoser
+    повторяет маршруты пользователей), и варианты с суффиксом формата
+    пропускаются.
+    """
+    routes = set()
+    seen = set()
+    for path, pattern in url_patterns(get_resolver()):
+        if not path.startswith('api/') or 'format' in path or path in seen:
+            continue
+        seen.add(path)
+        view = pattern.callback
+        methods = getattr(view, 'actions', None) or [
+            method for method in view.cls.http_method_names
+            if hasattr(view.cls, method)
+        ]
+        routes.update(
+            (pattern.name, method) for method in methods
+            if method not in ('head', 'options', 'trace')
+        )
+    return routes
+
+
+@pytest.fixture(autouse=True)
+def warm_catalogs():
+    """Справочники и индексы загружены, как после старта воркера."""
+    tag_catalog.load()
+    ingredient_index.load()
+    recipe_ingredient_index.load()
+
+
+def budgets():
+    for name, (route, method, limits, build) in CASES.items():
+        for role, budget in zip(('anonymous', 'authorized'), limits):
+            if budget is not None:
+                yield pytest.param(name, role, budget, id=f'{name}-{role}')
+
+
+def count_queries(client, method, path, body, status):
+    """Число запросов маршрута без точек сохранения транзакции теста."""
+    if method == 'get':
+        client.get(path)
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, method)(path, body, format='json')
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+    assert response.status_code == status, getattr(response, 'data', None)
+    count = sum(
+        not query['sql'].startswith(SAVEPOINT_PREFIXES)
+        for query in queries.captured_queries
+    )
+    return count, queries.captured_queries
+
+
+@pytest.mark.parametrize('limit', LIMITS)
+@pytest.mark.parametrize('name, role, budget', budgets())
+def test_query_budget(clients, small_clients, sample_data, small_sample_data,
+                      image_payload, query_counts, name, role, budget,
+                      limit):
+    route, method, limits, build = CASES[name]
+    counts = {}
+    for volume, data, volume_clients in (
+        ('large', sample_data, clients),
+        ('small', small_sample_data, small_clients),
+    ):
+        # Изменения каждого объема откатываются, чтобы маршрут,
+        # создающий объекты, можно было вызвать повторно.
+        with transaction.atomic():
+            path, body, status = build(data, limit, image_payload)
+            counts[volume], queries = count_queries(
+                volume_clients[role], method, path, body, status
+            )
+            transaction.set_rollback(True)
+    measured = query_counts.setdefault(name, {})
+    measured[role] = max(measured.get(role, 0), *counts.values())
+    assert counts['small'] == counts['large'], counts
+    assert counts['large'] <= budget, '\n'.join(
+        query['sql'] for query in queries
+    )
+
+
+def test_every_route_has_budget():
+    checked = {(route, method) for route, method, *_ in CASES.values()}
+    assert registered_routes() - checked == set()
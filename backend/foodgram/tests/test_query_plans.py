@@ -0,0 +1,89 @@
+import re
+
+import pytest
+from django.db import connection
+
+from api.indexes import id_list
+from recipes.models import (Favorite, Recipe, RecipeIngredient, ShoppingCart,
+                            ShoppingListItem)
+from recipes.search import search_recipes
+from users.models import Follow
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        connection.vendor != 'postgresql',
+        reason='Планы запросов проверяются на PostgreSQL.'
+    ),
+]
+
+SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def recipe_ids(data):
+    return [recipe.id for recipe in data['recipes'][:6]]
+
+
+# Запросы, которые выполняются на каждой странице API.
+HOT_QUERIES = {
+    'лента рецептов': lambda data: (
+        Recipe.objects.order_by('-pub_date', '-id')[:6]
+    ),
+    'рецепты автора': lambda data: Recipe.objects.filter(
+        author=data['user']
+    ).order_by('-pub_date')[:3],
+    'фильтр по тегу': lambda data: Recipe.objects.filter(
+        tags__in=[data['tags'][0].id]
+    ).distinct()[:6],
+    'поиск рецептов': lambda data: search_recipes(
+        Recipe.objects.all(), 'пирог с капустой'
+    )[:6],
+    'рецепты по списку': lambda data: Recipe.objects.filter(
+        pk__in=id_list(recipe_ids(data))
+    )[:6],
+    'фильтр по избранному': lambda data: Recipe.objects.filter(
+        favorite__user=data['user']
+    )[:6],
+    'рецепт в избранном': lambda data: Favorite.objects.filter(
+        user=data['user'], recipe=data['recipes'][1]
+    ),
+    'рецепт в корзине': lambda data: ShoppingCart.objects.filter(
+        user=data['user'], recipe=data['recipes'][1]
+    ),
+    'корзины с рецептом': lambda data: ShoppingCart.objects.filter(
+        recipe=data['recipes'][1]
+    ).values('user'),
+    'ингредиенты рецептов': lambda data: RecipeIngredient.objects.filter(
+        recipe__in=recipe_ids(data)
+    ).select_related('ingredient'),
+    'теги рецептов': lambda data: Recipe.tags.through.objects.filter(
+        recipe__in=recipe_ids(data)
+    ).select_related('tag'),
+    'список покупок': lambda data: ShoppingListItem.objects.filter(
+        user=data['user']
+    ).select_related('ingredient'),
+    'подписки': lambda data: Follow.objects.filter(
+        user=data['user']
+    ).select_related('author'),
+    'подписка на автора': lambda data: Follow.objects.filter(
+        user=data['user'], author=data['recipes'][2].author
+    ),
+}
+
+
+@pytest.fixture
+def planner(sample_data):
+    """Статистика по тестовым данным и запрет чтения таблиц целиком.
+
+    На небольшой таблице планировщик может выбрать чтение целиком,
+    даже если подходящий индекс есть.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        cursor.execute('SET LOCAL enable_seqscan = off')
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+def test_query_uses_index(sample_data, planner, name):
+    plan = HOT_QUERIES[name](sample_data).explain()
+    assert not SEQ_SCAN.findall(plan), plan
@@ -0,0 +1,84 @@
+import pytest
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+
+from recipes import signals
+from recipes.models import Recipe
+
+pytestmark = pytest.mark.django_db
+
+sqlite_only = pytest.mark.skipif(
+    connection.vendor != 'sqlite', reason='FTS5 есть только в SQLite.'
+)
+postgresql_only = pytest.mark.skipif(
+    connection.vendor != 'postgresql',
+    reason='Стемминг и триграммы есть только в PostgreSQL.'
+)
+
+
+@pytest.fixture
+def recipes(sample_data):
+    """Рецепты со словом, которого нет в остальных данных: в названии
+    и только в описании."""
+    author = sample_data['user']
+    return {
+        'name': Recipe.objects.create(
+            author=author, name='Пирог со шпинатником',
+            text='Раскатайте тесто.', cooking_time=40,
+        ),
+        'text': Recipe.objects.create(
+            author=author, name='Зеленый суп',
+            text='В конце добавьте шпинатник.', cooking_time=20,
+        ),
+    }
+
+
+def found(clients, text):
+    response = clients['anonymous'].get(
+        '/api/recipes/', {'search': text, 'limit': 50}
+    )
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def test_search_ranks_name_above_text(clients, recipes):
+    assert found(clients, 'шпинатник') == [
+        recipes['name'].id, recipes['text'].id
+    ]
+
+
+def test_search_finds_updated_name(clients, recipes):
+    recipe = recipes['text']
+    recipe.name = 'Суп с крапивицей'
+    recipe.save()
+    assert found(clients, 'крапивицей') == [recipe.id]
+
+
+def test_search_without_match_is_empty(clients, recipes):
+    assert found(clients, 'ъщзхвы') == []
+
+
+@sqlite_only
+def test_search_matches_prefix(clients, recipes):
+    assert set(found(clients, 'шпинат')) == {
+        recipes['name'].id, recipes['text'].id
+    }
+
+
+@postgresql_only
+def test_search_matches_word_forms(clients, recipes):
+    assert set(found(clients, 'шпинатниками')) == {
+        recipes['name'].id, recipes['text'].id
+    }
+
+
+@postgresql_only
+def test_search_tolerates_typo_in_name(clients, recipes):
+    assert found(clients, 'шпинатнеком') == [recipes['name'].id]
+
+
+def test_search_repaired_once_per_migrate(monkeypatch):
+    calls = []
+    monkeypatch.setattr(signals, 'repair', calls.append)
+    emit_post_migrate_signal(0, False, 'default')
+    assert len(calls) == 1
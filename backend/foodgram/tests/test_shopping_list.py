@@ -0,0 +1,131 @@
+import pytest
+from django.db import IntegrityError, connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import (Recipe, RecipeIngredient, ShoppingCart,
+                            ShoppingListItem, ShoppingListItemManager)
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def cart(sample_data):
+    """Строка корзины с рецептом, который есть и в других корзинах."""
+    return ShoppingCart.objects.filter(
+        recipe__in=ShoppingCart.objects.exclude(
+            user=sample_data['user']
+        ).values('recipe')
+    ).select_related('recipe').first()
+
+
+def assert_in_sync():
+    assert ShoppingListItem.objects.mismatches() == {}
+
+
+def test_cart_add_change_and_delete(sample_data, cart):
+    user = sample_data['users'][-1]
+    added = ShoppingCart.objects.create(
+        user=user, recipe=sample_data['recipes'][-1]
+    )
+    assert_in_sync()
+    added.user = sample_data['users'][-2]
+    added.recipe = cart.recipe
+    ShoppingCart.objects.filter(
+        user=added.user, recipe=added.recipe
+    ).delete()
+    added.save()
+    assert_in_sync()
+    added.delete()
+    assert_in_sync()
+    ShoppingCart.objects.filter(recipe=cart.recipe).delete()
+    assert_in_sync()
+
+
+def test_recipe_ingredient_changes(sample_data, cart):
+    item = cart.recipe.recipe_ingredients.first()
+    item.amount += 7
+    item.save()
+    assert_in_sync()
+    item.ingredient = sample_data['ingredients'][-1]
+    RecipeIngredient.objects.filter(
+        recipe=cart.recipe, ingredient=item.ingredient
+    ).delete()
+    item.save()
+    assert_in_sync()
+    RecipeIngredient.objects.create(
+        recipe=cart.recipe, ingredient=sample_data['ingredients'][-2],
+        amount=3
+    )
+    assert_in_sync()
+    item.delete()
+    assert_in_sync()
+    cart.recipe.recipe_ingredients.all()[:1].get().delete()
+    assert_in_sync()
+
+
+def test_recipe_and_author_delete(cart):
+    cart.recipe.delete()
+    assert_in_sync()
+    author = Recipe.objects.filter(
+        favorite_shops__isnull=False
+    ).first().author
+    author.delete()
+    assert_in_sync()
+
+
+def test_recipe_update_through_api(clients, sample_data):
+    recipe = sample_data['recipes'][0]
+    ShoppingCart.objects.create(user=sample_data['users'][-1], recipe=recipe)
+    kept = recipe.recipe_ingredients.first()
+    response = clients['authorized'].patch(
+        f'/api/recipes/{recipe.id}/',
+        {
+            'ingredients': [
+                {'id': kept.ingredient_id, 'amount': kept.amount + 1},
+                {'id': sample_data['ingredients'][-1].id, 'amount': 5},
+            ],
+            'tags': [sample_data['tags'][0].id],
+            'cooking_time': recipe.cooking_time,
+        },
+        format='json'
+    )
+    assert response.status_code == 200
+    assert_in_sync()
+
+
+def test_apply_changes_retries_conflict(monkeypatch, sample_data):
+    bulk_create = ShoppingListItemManager.bulk_create
+    calls = []
+
+    def conflicting_bulk_create(self, *args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise IntegrityError('unique_shopping_list_item')
+        return bulk_create(self, *args, **kwargs)
+
+    monkeypatch.setattr(
+        ShoppingListItemManager, 'bulk_create', conflicting_bulk_create
+    )
+    ShoppingCart.objects.create(
+        user=sample_data['users'][-1], recipe=sample_data['recipes'][-1]
+    )
+    assert len(calls) == 2
+    assert_in_sync()
+
+
+def test_author_delete_rebuilds_lists_once(sample_data):
+    author = User.objects.annotate(
+        carts=Count('recipes__favorite_shops')
+    ).filter(carts__gt=5).first()
+    with CaptureQueriesContext(connection) as queries:
+        author.delete()
+    list_queries = [
+        query for query in queries.captured_queries
+        if 'recipes_shoppinglistitem' in query['sql']
+    ]
+    assert len(list_queries) <= 4, '\n'.join(
+        query['sql'] for query in list_queries
+    )
+    assert_in_sync()
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from rest_framework.serializers import (BaseSerializer, ModelSerializer,
+                                        Serializer)
+
+from api.serializers import RecipeCreateSerializer, RecipeSerializer
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def request_timing(settings):
+    """Middleware подключается при загрузке обработчика клиента."""
+    settings.REQUEST_TIMING = True
+
+
+def server_timing(response):
+    return dict(
+        (part.split(';')[0], part)
+        for part in response['Server-Timing'].split(', ')
+    )
+
+
+def duration(metric):
+    return float(metric.split(';')[1].removeprefix('dur='))
+
+
+def timing_logs(caplog):
+    return [
+        json.loads(record.getMessage()) for record in caplog.records
+        if record.name == 'foodgram.timing'
+    ]
+
+
+def serializer_methods():
+    """Методы сериализаторов DRF и проекта; учет времени идет через
+    подклассы и не должен их подменять."""
+    classes = (BaseSerializer, Serializer, ModelSerializer, RecipeSerializer,
+               RecipeCreateSerializer)
+    names = ('is_valid', 'run_validation', 'to_representation')
+    return {
+        (cls, name): getattr(cls, name) for cls in classes for name in names
+    }
+
+
+def test_recipe_list_timings(clients):
+    methods = serializer_methods()
+    response = clients['authorized'].get('/api/recipes/?limit=6')
+    metrics = server_timing(response)
+    assert set(metrics) == {'sql', 'view', 'serializer', 'render', 'total'}
+    assert 'queries' in metrics['sql']
+    assert 0 < duration(metrics['serializer']) <= duration(metrics['view'])
+    assert serializer_methods() == methods
+
+
+def test_recipe_update_timings(clients, sample_data, image_payload):
+    methods = serializer_methods()
+    response = clients['authorized'].patch(
+        f'/api/recipes/{sample_data["recipes"][0].id}/',
+        {
+            'name': 'Омлет',
+            'text': 'Взбить и пожарить.',
+            'cooking_time': 10,
+            'image': image_payload,
+            'tags': [sample_data['tags'][0].id],
+            'ingredients': [
+                {'id': sample_data['ingredients'][0].id, 'amount': 3}
+            ],
+        },
+        format='json'
+    )
+    assert response.status_code == 200
+    metrics = server_timing(response)
+    assert 0 < duration(metrics['serializer']) <= duration(metrics['view'])
+    assert serializer_methods() == methods
+
+
+def test_streaming_queries_are_counted(clients, caplog):
+    caplog.set_level('INFO', logger='foodgram.timing')
+    response = clients['authorized'].get(
+        '/api/recipes/download_shopping_cart/?format=txt'
+    )
+    assert 'Server-Timing' not in response
+    assert timing_logs(caplog) == []
+    content = b''.join(response.streaming_content)
+    assert content
+    [log] = timing_logs(caplog)
+    # Аутентификация и чтение списка покупок при отдаче файла.
+    assert log['sql_count'] == 2
+    assert log['render_ms'] > 0
+
+
+def test_async_requests_are_timed(sample_data):
+    client = AsyncClient(
+        headers={'Authorization': f'Token {sample_data["token"].key}'}
+    )
+    response = async_to_sync(client.get)('/api/tags/')
+    assert response.status_code == 200
+    assert 'total' in server_timing(response)
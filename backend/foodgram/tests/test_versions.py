@@ -0,0 +1,73 @@
+import pytest
+
+from api.cache import RECIPE_INGREDIENTS, RECIPES, get_version
+from recipes.models import Recipe
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+def bumps(save, django_capture_on_commit_callbacks, name=RECIPES):
+    """Сменилась ли версия ``name`` после ``save`` и фиксации."""
+    before = get_version(name)
+    with django_capture_on_commit_callbacks(execute=True):
+        save()
+    return get_version(name) != before
+
+
+def test_author_name_change_bumps_recipes(sample_data,
+                                          django_capture_on_commit_callbacks):
+    author = User.objects.get(pk=sample_data['user'].pk)
+    author.first_name = 'Новое имя'
+    assert bumps(author.save, django_capture_on_commit_callbacks)
+
+
+@pytest.mark.parametrize('change', ('password', 'last_login', 'no_recipes'))
+def test_other_user_saves_keep_recipes(sample_data, change,
+                                       django_capture_on_commit_callbacks):
+    user = User.objects.get(pk=sample_data['user'].pk)
+    if change == 'password':
+        user.set_password('new-password')
+        save = user.save
+    elif change == 'last_login':
+        def save():
+            user.save(update_fields=('last_login', ))
+    else:
+        user = User.objects.filter(recipes_count=0).first()
+        user.first_name = 'Новое имя'
+        save = user.save
+    assert not bumps(save, django_capture_on_commit_callbacks)
+
+
+@pytest.mark.parametrize('change, bumped', (
+    ('name', False),
+    ('amounts', False),
+    ('ingredients', True),
+))
+def test_recipe_ingredients_version(clients, sample_data, change, bumped,
+                                    django_capture_on_commit_callbacks):
+    recipe = Recipe.objects.get(pk=sample_data['recipes'][0].pk)
+    ingredients = [
+        {'id': item.ingredient_id, 'amount': item.amount}
+        for item in recipe.recipe_ingredients.all()
+    ]
+    if change == 'amounts':
+        ingredients[0]['amount'] += 1
+    elif change == 'ingredients':
+        ingredients.pop()
+    data = {
+        'name': 'Новое название',
+        'ingredients': ingredients,
+        'tags': [tag.id for tag in recipe.tags.all()],
+        'cooking_time': recipe.cooking_time,
+    }
+
+    def save():
+        response = clients['authorized'].patch(
+            f'/api/recipes/{recipe.id}/', data, format='json'
+        )
+        assert response.status_code == 200
+
+    assert bumps(
+        save, django_capture_on_commit_callbacks, RECIPE_INGREDIENTS
+    ) is bumped
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from recipes.paginators import EstimatedCountPaginator
 from users.models import Follow, User
 
 
@@ -7,11 +8,17 @@ from users.models import Follow, User
 class UserAdmin(admin.ModelAdmin):
     list_display = ('username', 'email', 'last_name', 'first_name')
     search_fields = ('username', 'email')
-    list_filter = ('username', 'email')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('=user__email', '=author__email')
+    autocomplete_fields = ('user', 'author')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -2,8 +2,10 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.db.models import CheckConstraint, F, Q, UniqueConstraint
 
+from common.models import CountersMixin
 
-class User(AbstractUser):
+
+class User(CountersMixin, AbstractUser):
     """Пользователи проекта."""
 
     USERNAME_FIELD = 'email'
@@ -30,6 +32,18 @@ class User(AbstractUser):
         verbose_name='Пароль',
         max_length=128,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         verbose_name = 'Пользователь'